@@ -1,18 +1,33 @@
 # Standard library
+import asyncio
+import gzip
+import hashlib
 import logging
 import os
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict
 
 # Third-party
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
-from fastapi.responses import HTMLResponse
+import anyio.to_thread
+import httpx
+import orjson
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from openai import OpenAI
+from starlette.concurrency import iterate_in_threadpool
+from pydantic import BaseModel, ValidationError
+from openai import AsyncOpenAI
 
 # Local imports
 from generator import VibeWatchRecommender
+from api.batching import RecommendBatcher
+from semantic_cache import filter_signature
 import db
+import retriever
 
 # ---------------------------------------------------------------------------
 # Logging configuration
@@ -28,35 +43,217 @@ logger = logging.getLogger(__name__)
 
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") or "YOUR_OPENAI_API_KEY_HERE"
-
-app = FastAPI(title="VibeWatch Recommender")
-
-# Mount static files for images
-app.mount("/images", StaticFiles(directory="images"), name="images")
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+# /static assets are never edited in place (a changed asset gets a new file
+# name or version query string), so browsers and CDNs may keep them for a
+# year without revalidating.
+STATIC_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# /images URLs carry no version, so they are only cached for a day and then
+# revalidated against StaticFiles' ETag / Last-Modified.
+IMAGES_CACHE_CONTROL = "public, max-age=86400"
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Whisper rejects audio over 25 MB, so anything larger is refused with 413
+# before it is spooled, hashed or sent upstream. The request-level check
+# allows some slack for the multipart framing around the file.
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+MAX_VOICE_REQUEST_BYTES = MAX_UPLOAD_BYTES + 64 * 1024
+# Worker threads for blocking work: recommender batches (asyncio.to_thread)
+# and Starlette's upload / static-file I/O (anyio). Both default to ~40.
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", "100"))
+
+
+class VoiceUploadLimitMiddleware:
+    """Reject oversized /recommend_voice requests with 413 before the body is parsed or spooled.
+
+    A declared Content-Length over the limit is refused up front. Otherwise
+    (chunked uploads, or a lying header) the body bytes are counted as the app
+    receives them, and the 413 goes out as soon as the total passes the limit;
+    the app then sees a client disconnect and its own response is dropped.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != "/recommend_voice":
+            await self.app(scope, receive, send)
+            return
+
+        too_large = ORJSONResponse({"detail": "Audio upload too large"}, status_code=413)
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > MAX_VOICE_REQUEST_BYTES:
+            await too_large(scope, receive, send)
+            return
+
+        received = 0
+        response_started = rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > MAX_VOICE_REQUEST_BYTES:
+                    rejected = True
+                    if not response_started:
+                        await too_large(scope, receive, send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if rejected:
+                return  # the 413 has already been sent
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that stamps every file response with a fixed Cache-Control header."""
+
+    def __init__(self, *args, cache_control: str = STATIC_CACHE_CONTROL, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = self.cache_control
+        return response
+
+
+async def _warm_up(app: FastAPI):
+    """Build the recommender and warm its connections, then mark the app ready."""
+    # Build the recommender and load the FAISS index in worker threads so the
+    # event loop stays responsive and the first request doesn't pay for it.
+    recommender = await asyncio.to_thread(VibeWatchRecommender, openai_api_key=OPENAI_API_KEY)
+    try:
+        await asyncio.to_thread(retriever.warmup)
+    except Exception:
+        logger.exception("Retriever warm-up failed; the index will be loaded on first request")
+    if OPENAI_API_KEY != "YOUR_OPENAI_API_KEY_HERE":
+        # One throwaway embedding loads the tokenizer and builds the OpenAI
+        # client, which otherwise happens inside the first user request.
+        try:
+            await asyncio.to_thread(retriever.embed_query, "warmup")
+        except Exception:
+            logger.warning("Embedding warm-up failed; the first request will pay for it", exc_info=True)
+        # A free models.list() call opens the pooled connection (DNS + TLS) so
+        # the first Whisper upload doesn't pay for the handshake.
+        try:
+            await app.state.openai_client.models.list()
+        except Exception:
+            logger.warning("OpenAI connection warm-up failed", exc_info=True)
+    app.state.recommender = recommender
+    app.state.batcher = RecommendBatcher(recommender)
+    app.state.batcher.start()
+    app.state.ready = True
+    logger.info("Recommender ready")
+
+
+def _log_warm_up_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Start-up failed; /ready will keep returning 503", exc_info=task.exception())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if OPENAI_API_KEY == "YOUR_OPENAI_API_KEY_HERE":
+        logger.warning("OPENAI_API_KEY not set. Recommender will likely fail.")
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE))
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREAD_POOL_SIZE
+    db.init_db()
+    # One pooled HTTP/2 client keeps TLS connections to the OpenAI API warm
+    app.state.http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=100, max_connections=200, keepalive_expiry=30.0),
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+    app.state.openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=app.state.http_client)
+    # Loading the index and warming connections happens once the server is
+    # accepting requests, so /healthz answers at once and /ready reports 503
+    # until the first real query can be answered at full speed.
+    warm_up = asyncio.create_task(_warm_up(app))
+    warm_up.add_done_callback(_log_warm_up_failure)
+
+    yield
+
+    app.state.ready = False
+    warm_up.cancel()
+    await asyncio.gather(warm_up, return_exceptions=True)
+    if app.state.batcher is not None:
+        await app.state.batcher.stop()
+    await app.state.http_client.aclose()
+    db.close_db()
+
+
+app = FastAPI(title="VibeWatch Recommender", default_response_class=ORJSONResponse, lifespan=lifespan)
+app.state.ready = False
+app.state.batcher = None
+app.add_middleware(VoiceUploadLimitMiddleware)
+
+# Mount static files for images and the page's stylesheet / script
+app.mount("/images", CachedStaticFiles(directory="images", cache_control=IMAGES_CACHE_CONTROL), name="images")
+app.mount("/static", CachedStaticFiles(directory=STATIC_DIR), name="static")
 
 
 class RecommendRequest(BaseModel):
     user_input: str
     k: int = 10
+    # Structured refinements from the UI (mood, age, genre, surprise). They are
+    # also worded into user_input for the LLM; here they key the caches, so two
+    # filter choices never share results however similar their text embeds.
+    filters: Dict[str, str] = {}
 
 
-@app.on_event("startup")
-async def startup_event():
-    global recommender
-    if OPENAI_API_KEY == "YOUR_OPENAI_API_KEY_HERE":
-        logger.warning("OPENAI_API_KEY not set. Recommender will likely fail.")
-    global openai_client
-    recommender = VibeWatchRecommender(openai_api_key=OPENAI_API_KEY)
-    db.init_db()
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
+def _require_ready(request: Request):
+    if not request.app.state.ready:
+        raise HTTPException(status_code=503, detail="Recommender is still starting, try again shortly")
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness probe: the process is up and serving."""
+    return Response(status_code=200)
+
 
+@app.get("/ready")
+async def ready(request: Request):
+    """Readiness probe: 503 until the recommender and clients are initialised."""
+    return Response(status_code=200 if request.app.state.ready else 503)
+
+
+# Bodies are validated straight from raw JSON bytes by pydantic-core, which
+# skips FastAPI's json.loads -> dict -> model round-trip. openapi_extra keeps
+# the request schema visible in /docs.
+RECOMMEND_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": RecommendRequest.model_json_schema()}},
+    }
+}
 
-@app.post("/recommend")
-async def recommend(req: RecommendRequest):
+
+async def _read_recommend_request(request: Request) -> RecommendRequest:
+    try:
+        return RecommendRequest.model_validate_json(await request.body())
+    except ValidationError as e:
+        # Match FastAPI's own error shape, which roots body errors at "body"
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)])
+
+
+@app.post("/recommend", openapi_extra=RECOMMEND_OPENAPI)
+async def recommend(request: Request):
+    _require_ready(request)
+    req = await _read_recommend_request(request)
     try:
-        print(f"DEBUG - /recommend received: query='{req.user_input}' | k={req.k}")
+        logger.debug("/recommend received: query=%r | k=%d", req.user_input, req.k)
         db.log_query('/recommend', req.user_input)
-        recs = recommender.recommend(req.user_input, k=req.k)
+        recs = await request.app.state.batcher.submit(req.user_input, req.k, filter_signature(req.filters))
         # Note: poster URLs are now included in the metadata from our embedding system
         # No need to fetch from external TMDB API anymore
         return recs
@@ -65,552 +262,183 @@ async def recommend(req: RecommendRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/recommend_stream", openapi_extra=RECOMMEND_OPENAPI)
+async def recommend_stream(request: Request):
+    """Like /recommend, but streams NDJSON so cards can render while the LLM is still writing.
+
+    Each line is `{"stage": "rec", "rec": {...}}`; a failure mid-stream ends with
+    `{"stage": "error", "detail": ...}`.
+    """
+    _require_ready(request)
+    req = await _read_recommend_request(request)
+    logger.debug("/recommend_stream received: query=%r | k=%d", req.user_input, req.k)
+    db.log_query('/recommend_stream', req.user_input)
+    state = request.app.state
+    signature = filter_signature(req.filters)
+
+    # Streaming requests are not coalesced by the batcher: a batch only
+    # resolves once every completion in it has finished, which would hold back
+    # the first card. They still share the recommender's caches, and join an
+    # identical /recommend or /recommend_voice query that is already in flight.
+    async def stream():
+        try:
+            shared = state.batcher.inflight(req.user_input, req.k, signature)
+            if shared is not None:
+                for rec in await asyncio.shield(shared):
+                    yield orjson.dumps({"stage": "rec", "rec": rec}) + b"\n"
+                return
+            # The blocking embedding / LLM stream is iterated in the threadpool
+            recs = iterate_in_threadpool(state.recommender.recommend_stream(req.user_input, req.k, signature))
+            async for rec in recs:
+                yield orjson.dumps({"stage": "rec", "rec": rec}) + b"\n"
+        except Exception as e:
+            logger.exception("Error processing /recommend_stream request")
+            yield orjson.dumps({"stage": "error", "detail": str(e)}) + b"\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 # Voice-based recommendation endpoint
 
 
 @app.post("/recommend_voice")
-async def recommend_voice(file: UploadFile = File(...), k: int = Form(10)):
-    """Accepts an audio file, transcribes it with Whisper, then returns movie recommendations."""
+async def recommend_voice(request: Request, file: UploadFile = File(...), k: int = Form(10)):
+    """Accepts an audio file, transcribes it with Whisper, then streams movie recommendations.
+
+    The response is NDJSON: a `{"stage": "transcribed", "query": ...}` line as soon as
+    Whisper returns, then `{"stage": "recs", "recs": [...]}` (or `{"stage": "error", ...}`).
+    """
+    _require_ready(request)
+    state = request.app.state
     try:
-        # Save uploaded audio to a temporary file
-        contents = await file.read()
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as tmp:
-            tmp.write(contents)
-            tmp.flush()
-            tmp_path = tmp.name
-
-        # Transcribe using OpenAI Whisper via new SDK
-        resp = openai_client.audio.transcriptions.create(
-            model="whisper-1",
-            file=open(tmp_path, "rb")
-        )
-        query_text = resp.text
-
-        print(f"DEBUG - /recommend_voice transcription: '{query_text}' | k={k}")
+        # Hash the upload in chunks rather than buffering the whole clip; Starlette
+        # already spools large uploads to disk, so memory stays flat per request.
+        # VoiceUploadLimitMiddleware caps the whole request; this enforces
+        # Whisper's limit on the file itself, without the multipart framing.
+        hasher = hashlib.sha256()
+        size = 0
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail="Audio upload too large")
+            hasher.update(chunk)
+        audio_hash = hasher.hexdigest()
+
+        # SQLite calls share a lock with the log writer, so keep them off the event loop
+        query_text = await asyncio.to_thread(db.get_transcription, audio_hash)
+        if query_text is None:
+            # Transcribe using OpenAI Whisper via the async SDK client, which
+            # streams the spooled file object itself
+            await file.seek(0)
+            audio = (file.filename or "voice.webm", file.file, file.content_type or "audio/webm")
+            resp = await state.openai_client.audio.transcriptions.create(
+                model="whisper-1",
+                file=audio,
+            )
+            query_text = resp.text
+            await asyncio.to_thread(db.save_transcription, audio_hash, query_text)
+
+        logger.debug("/recommend_voice transcription: %r | k=%d", query_text, k)
         db.log_query('/recommend_voice', query_text)
-        # Fetch recommendations via existing pipeline
-        recs = recommender.recommend(query_text, k=k)
-        # Note: poster URLs are now included in the metadata from our embedding system
-        return {"query": query_text, "recs": recs}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error processing /recommend_voice request")
         raise HTTPException(status_code=500, detail=str(e))
 
-
-HTML_PAGE = """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-  <meta charset="UTF-8">
-  <meta name="viewport" content="width=device-width, initial-scale=1.0">
-  <title>VibeWatch – Movie Mood Matcher</title>
-
-  <style>
-    :root {
-      --bg: #17171b;
-      --card-bg: #1f1f1f;
-      --accent: #ffffff;
-      --text: #f5f5f5;
-      --muted: #b3b3b3;
-    }
-    * { box-sizing: border-box; }
-    body {
-      margin: 0;
-      padding: 0;
-      font-family: 'Avenir', 'Avenir Next', 'Helvetica Neue', sans-serif;
-      background: var(--bg);
-      color: var(--text);
-      min-height: 100vh;
-      display: flex;
-      flex-direction: column;
-    }
-    header {
-      padding: 24px 32px;
-      font-size: 1.8rem;
-      font-weight: 600;
-      color: var(--accent);
-      letter-spacing: -0.5px;
-      display: flex;
-      align-items: center;
-      gap: 12px;
-    }
-    header .logo { height: 36px; }
-    main {
-      width: 100%;
-      max-width: 1100px;
-      margin: 0 auto;
-      padding: 0 16px 40px;
-      flex: 1;
-    }
-    #queryBox {
-      width: 100%;
-      height: 80px;
-      padding: 16px;
-      font-size: 1rem;
-      border: none;
-      border-radius: 8px;
-      resize: vertical;
-      margin-bottom: 12px;
-      background: linear-gradient(180deg, #306676 0%, #819fa9 100%);
-      color: #e0e0e0;
-    }
-    #queryBox::placeholder {
-      color: #e0e0e0;
-      opacity: 1;
-    }
-    #submitBtn, #micBtn, #surpriseBtn {
-      background: var(--accent);
-      color: #17171b;
-      border: none;
-      padding: 14px 28px;
-      font-weight: 600;
-      font-size: 1rem;
-      border-radius: 6px;
-      cursor: pointer;
-      transition: opacity .2s ease;
-      min-width: 150px;
-      display: inline-flex;
-      align-items: center;
-      justify-content: center;
-      height: 48px;
-    }
-    #micBtn { margin-left:0; }
-    #micBtn.rec {
-      background: #1db954;
-    }
-    #submitBtn:hover, #micBtn:hover { opacity: .9; }
-    #surpriseBtn {background:#8e44ad;display:none;}
-    #surpriseBtn:hover{opacity:.9;}
-    #actionButtons{display:flex;flex-direction:row;gap:8px;align-items:center;margin-bottom:16px;flex-wrap:wrap;}
-    #actionButtons button{width:auto;}
-    #resultsGrid {
-      margin-top: 32px;
-      display: grid;
-      grid-template-columns: repeat(auto-fill, minmax(180px, 1fr));
-      gap: 24px;
-    }
-    .movie-card {
-      background: var(--card-bg);
-      border-radius: 8px;
-      overflow: hidden;
-      display: flex;
-      flex-direction: column;
-      height: 100%;
-    }
-    .movie-card img {
-      width: 100%;
-      aspect-ratio: 2/3;
-      object-fit: cover;
-      background: #333;
-    }
-    .movie-info {
-      padding: 12px 14px;
-      flex: 1;
-      display: flex;
-      flex-direction: column;
-    }
-    .movie-title {
-      font-size: .95rem;
-      font-weight: 600;
-      margin-bottom: 6px;
-      line-height: 1.2;
-    }
-    .movie-reason {
-      font-size: .8rem;
-      color: var(--muted);
-      line-height: 1.3;
-    }
-    .loading {
-      text-align: center;
-      margin-top: 40px;
-      color: var(--accent);
-      font-weight: 600;
-    }
-    #moodContainer {
-      display: flex;
-      justify-content: center;
-      gap: 8px;
-      flex-wrap: wrap;
-      margin-top: 20px;
-    }
-    /* Unified knob styles (mood + age) */
-    .knob-btn {
-      background: var(--card-bg);
-      border: 1px solid var(--muted);
-      color: var(--text);
-      padding: 8px 16px;
-      border-radius: 999px;
-      cursor: pointer;
-      font-size: .85rem;
-      display: flex;
-      align-items: center;
-      gap: 6px;
-      transition: background .2s ease, border .2s ease, box-shadow .2s ease, transform .15s ease;
-    }
-    .knob-btn:hover {
-      background: #2d2d2d;
-      transform: translateY(-2px);
-      box-shadow: 0 4px 10px rgba(0,0,0,0.25);
-    }
-    .knob-btn.selected {
-      border-color: var(--accent);
-      background: linear-gradient(135deg, var(--accent) 0%, #ff7d1a 100%);
-      color: #fff;
-      box-shadow: 0 0 10px rgba(229,9,20,0.6);
-    }
-    .selector-row .knob-btn { flex: 0 0 auto; margin-right: 8px; }
-    .selector-row .knob-btn:last-child { margin-right: 0; }
-
-    /* Specific tweaks */
-    .mood-btn { font-size: .9rem; }
-    .age-btn  { font-size: .8rem; }
-    .knob-btn .emoji { font-size: 1.4rem; }
-    /* Age selector styles */
-    #ageContainer { flex-wrap: nowrap; overflow-x: auto; justify-content:center; }
-    .age-btn {
-      padding: 4px 12px;
-      font-size: .75rem;
-      white-space: nowrap;
-    }
-    /* Genre selector styles */
-    #genreContainer { flex-wrap: nowrap; overflow-x: auto; justify-content:center; }
-    .genre-btn { font-size: .78rem; padding: 4px 14px; white-space: nowrap; }
-    #genreSection { display: none; }
-    #moodSection, #ageSection { display:none; }
-    .mood-hint, .age-hint { display:none; }
-    .selector-row {
-      display: flex;
-      gap: 8px;
-      overflow-x: auto;
-      flex-wrap: nowrap;
-      padding-bottom: 4px;
-      -webkit-overflow-scrolling: touch;
-      scrollbar-width: thin;
-      justify-content: flex-start;
-    }
-    .selector-card {
-      background: #242424;
-      border-radius: 12px;
-      padding: 16px 12px;
-      margin-top: 20px;
-      box-shadow: 0 1px 3px rgba(0,0,0,0.4);
-    }
-    .selector-card + .selector-card { margin-top: 16px; }
-    .selector-title {
-      font-size: 1rem;
-      font-weight: 600;
-      color: var(--text);
-      margin: 0 0 8px;
-      text-align: left;
-    }
-    .summary-pill{background:#333;border-radius:16px;padding:6px 10px;font-size:.8rem;display:flex;align-items:center;gap:4px} .summary-pill button{background:none;border:none;color:#fff;cursor:pointer;font-size:.9rem}
-    /* Filter panel collapse */
-    .filters-container { transition: max-height .3s ease, opacity .3s ease, padding .3s ease, margin .3s ease; overflow:hidden; max-height:1000px; }
-    .filters-collapsed { max-height:0; padding:0!important; margin:0!important; opacity:0; pointer-events:none; }
-    .filter-header{display:flex;justify-content:space-between;align-items:center;margin-bottom:8px;}
-    .filters-heading{font-size:1.1rem;font-weight:600;color:var(--text);margin:0;}
-    .filter-toggle{background:#1a1a1a;color:#fff;border:none;padding:8px 16px;border-radius:6px;cursor:pointer;font-size:.9rem;display:flex;align-items:center;gap:4px;transition:opacity .2s ease,transform .2s ease;}
-    .filter-toggle:hover{opacity:.9;transform:translateY(-1px);}
-    #filterPanel{background:#18181b;border:1px solid #333;border-radius:12px;padding:20px;margin-top:24px;box-shadow:0 4px 10px rgba(0,0,0,.4);}    
-    .filter-header{border-bottom:1px solid #333;padding-bottom:10px;margin-bottom:14px;}
-    #controls{position:sticky;top:0;background:#17171b;padding-bottom:12px;z-index:100;border-bottom:1px solid #333;}
-    #controls textarea{margin-top:8px;}
-    #banner{display:none;background:#f39c12;color:#141414;text-align:center;padding:6px 12px;border-radius:6px;margin-top:8px;font-size:.9rem;}
-  </style>
-</head>
-<body>
-  <header><img src="/images/disney-plus-logo-white.png" class="logo" alt="Disney+ logo"/> VibeWatch</header>
-  <main>
-    <div id="controls">
-    <textarea id="queryBox" placeholder="Describe your vibe…"></textarea>
-    <div id="actionButtons">
-      <button id="surpriseBtn" onclick="surprise()">🎁 Surprise Me!</button>
-      <button id="submitBtn" onclick="submit()">Find Movies</button>
-      <button id="micBtn"><img src="/images/vibewatch-microphone.svg" alt="microphone" style="width: 16px; height: 16px; margin-right: 6px; vertical-align: middle;"> Speak</button>
-    </div>
-    <div id="filterPanel" style="display:none;">
-      <div class="filter-header"><h3 class="filters-heading">🎛️ Filters</h3><button id="toggleFiltersBtn" class="filter-toggle">Hide Filters ⬆️</button></div>
-      <div id="filterContent" class="filters-container">
-      <div id="moodSection" class="selector-card">
-      <h3 class="selector-title">🎭 Pick a Mood</h3>
-      <div id="moodContainer" class="selector-row">
-        <button class="mood-btn knob-btn" data-mood="happy"><span class="emoji">😊</span><span>Happy</span></button>
-        <button class="mood-btn knob-btn" data-mood="sad"><span class="emoji">😢</span><span>Sad</span></button>
-        <button class="mood-btn knob-btn" data-mood="tired"><span class="emoji">😴</span><span>Tired</span></button>
-        <button class="mood-btn knob-btn" data-mood="intense"><span class="emoji">🤯</span><span>Intense</span></button>
-        <button class="mood-btn knob-btn" data-mood="thoughtful"><span class="emoji">🧠</span><span>Thoughtful</span></button>
-        <button class="mood-btn knob-btn" data-mood="romantic"><span class="emoji">💖</span><span>Romantic</span></button>
-      </div>
-    </div>
-
-    <div id="ageSection" class="selector-card">
-      <h3 class="selector-title">👥 Audience Age Group</h3>
-      <div id="ageContainer" class="selector-row">
-        <button class="age-btn knob-btn" data-age="Kids (0–7)">🧒 Kids</button>
-        <button class="age-btn knob-btn" data-age="Tweens (8–12)">👦 Tweens</button>
-        <button class="age-btn knob-btn" data-age="Teens (13–17)">👧 Teens</button>
-        <button class="age-btn knob-btn" data-age="Adults (18+)">👨 Adults</button>
-        <button class="age-btn knob-btn" data-age="Seniors">👵 Seniors</button>
-        <button class="age-btn knob-btn" data-age="Mixed Family">👨‍👩‍👧 Family</button>
-      </div>
-    </div>
-
-    <div id="genreSection" class="selector-card">
-      <h3 class="selector-title">🎬 Genre</h3>
-      <div id="genreContainer" class="selector-row">
-        <button class="genre-btn knob-btn" data-genre="Action">Action</button>
-        <button class="genre-btn knob-btn" data-genre="Comedy">Comedy</button>
-        <button class="genre-btn knob-btn" data-genre="Drama">Drama</button>
-        <button class="genre-btn knob-btn" data-genre="Romance">Romance</button>
-        <button class="genre-btn knob-btn" data-genre="Thriller">Thriller</button>
-        <button class="genre-btn knob-btn" data-genre="Sci-Fi">Sci-Fi</button>
-        <button class="genre-btn knob-btn" data-genre="Animation">Animation</button>
-        <button class="genre-btn knob-btn" data-genre="Horror">Horror</button>
-      </div>
-    </div><!-- end genreSection -->
-      </div><!-- end filterContent -->
-      </div><!-- end filterPanel -->
-      <div id="banner">🎁 Surprise me mode activated! Enjoy a wildcard pick.</div>
-      </div><!-- end controls wrapper -->
-    <div id="summaryBar" style="display:none;margin-top:16px;gap:8px;flex-wrap:wrap;" class="selector-row"></div>
-    <div id="resultsGrid"></div>
-    <div id="loading" class="loading" style="display:none;">Searching…</div>
-  </main>
-  <script>
-    async function submit() {
-      const user_input = document.getElementById('queryBox').value.trim();
-      if (!user_input) {
-        const banner=document.getElementById('banner');
-        banner.style.display='block';
-        await surprise();
-        setTimeout(()=>{banner.style.display='none';},3000);
-        return;
-      }
-      originalQuery = user_input;
-      selectedMood = '';
-      selectedAge = '';
-      selectedGenre = '';
-      document.querySelectorAll('.mood-btn').forEach(b => b.classList.remove('selected'));
-      document.querySelectorAll('.age-btn').forEach(b => b.classList.remove('selected'));
-      document.querySelectorAll('.genre-btn').forEach(b => b.classList.remove('selected'));
-      document.getElementById('moodSection').style.display = 'none';
-      document.getElementById('ageSection').style.display = 'none';
-      document.getElementById('genreSection').style.display = 'none';
-      fetchRecommendations(buildFinalQuery());updateSummary();
-    }
-    document.getElementById('queryBox').addEventListener('keydown', e => {
-      if (e.key === 'Enter' && e.ctrlKey) submit();
-    });
-
-    const micBtn = document.getElementById('micBtn');
-    let mediaRecorder, audioChunks = [];
-
-    micBtn.addEventListener('click', async () => {
-      if (!mediaRecorder || mediaRecorder.state === 'inactive') {
-        try {
-          const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-          mediaRecorder = new MediaRecorder(stream);
-          audioChunks = [];
-          mediaRecorder.ondataavailable = e => audioChunks.push(e.data);
-          mediaRecorder.onstop = () => {
-            const blob = new Blob(audioChunks, { type: 'audio/webm' });
-            sendVoice(blob);
-            stream.getTracks().forEach(t => t.stop());
-          };
-          mediaRecorder.start();
-          micBtn.innerHTML = '⏹️ Stop';
-          micBtn.classList.add('rec');
-        } catch (err) {
-          alert('Microphone access denied');
-        }
-      } else if (mediaRecorder.state === 'recording') {
-        mediaRecorder.stop();
-        micBtn.innerHTML = '<img src="/images/vibewatch-microphone.svg" alt="microphone" style="width: 16px; height: 16px; margin-right: 6px; vertical-align: middle;"> Speak';
-        micBtn.classList.remove('rec');
-      }
-    });
-
-    async function sendVoice(blob) {
-      const grid = document.getElementById('resultsGrid');
-      const loading = document.getElementById('loading');
-      grid.innerHTML = '';
-      loading.style.display = 'block';
-      try {
-        const fd = new FormData();
-        fd.append('file', blob, 'voice.webm');
-        fd.append('k', '40');
-        const resp = await fetch('/recommend_voice', { method: 'POST', body: fd });
-        if (!resp.ok) {
-          let detail = resp.statusText;
-          try {
-            const errJson = await resp.json();
-            if (errJson && errJson.detail) detail = errJson.detail;
-          } catch {}
-          throw new Error(detail || `Server error (${resp.status})`);
-        }
-        const data = await resp.json();
-        loading.style.display = 'none';
-
-        originalQuery = data.query || '';
-        document.getElementById('queryBox').value = originalQuery;
-        renderResults(data.recs || []);
-      } catch (e) {
-        loading.style.display = 'none';
-        grid.innerHTML = `<div style="grid-column:1/-1;text-align:center;color:var(--accent);">${e.message || 'Something went wrong. Please try again later.'}</div>`;
-      }
-    }
-
-    async function surprise(){
-       if(!originalQuery){
-         originalQuery='Surprise me';
-         document.getElementById('queryBox').value='';
-       }
-       let query=buildFinalQuery();
-       if(!query){query='Surprise me with a great movie';}
-       else{query+=' (surprise me)';}
-       await fetchRecommendations(query);
-       updateSummary();
-    }
-
-    let originalQuery = '';
-    let selectedMood = '';
-    let selectedAge = '';
-    let selectedGenre = '';
-
-    function buildFinalQuery() {
-      let query = originalQuery;
-      if (selectedMood) query += ' that matches a ' + selectedMood + ' mood';
-      if (selectedAge) query += ' and is suitable for ' + selectedAge.toLowerCase();
-      if (selectedGenre) query += ' with ' + selectedGenre.toLowerCase() + ' genre';
-      return query;
-    }
-
-    async function fetchRecommendations(queryText) {
-      const grid = document.getElementById('resultsGrid');
-      const loading = document.getElementById('loading');
-      grid.innerHTML = '';
-      loading.style.display = 'block';
-      try {
-        const resp = await fetch('/recommend', {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ user_input: queryText, k: 40 })
-        });
-        if (!resp.ok) {
-          let detail = resp.statusText;
-          try {
-            const errJson = await resp.json();
-            if (errJson && errJson.detail) detail = errJson.detail;
-          } catch {}
-          throw new Error(detail || `Server error (${resp.status})`);
-        }
-        const data = await resp.json();
-        loading.style.display = 'none';
-        renderResults(data);
-      } catch (e) {
-        loading.style.display = 'none';
-        grid.innerHTML = `<div style="grid-column:1/-1;text-align:center;color:var(--accent);">${e.message || 'Something went wrong. Please try again later.'}</div>`;
-      }
-    }
-
-    function renderResults(recs) {
-      const grid = document.getElementById('resultsGrid');
-      if (Array.isArray(recs) && recs.length) {
-        grid.innerHTML = '';
-        recs.forEach((movie, idx) => {
-          const card = document.createElement('div');
-          card.className = 'movie-card';
-          const img = document.createElement('img');
-          img.src = movie.poster || 'https://upload.wikimedia.org/wikipedia/commons/3/3e/Disney%2B_logo.svg';
-          card.appendChild(img);
-          const info = document.createElement('div');
-          info.className = 'movie-info';
-          info.innerHTML = `<div class="movie-title">${idx + 1}. ${movie.title}</div><div class="movie-reason">${movie.reason}</div>`;
-          card.appendChild(info);
-          grid.appendChild(card);
-        });
-        const fp=document.getElementById('filterPanel');
-        if(fp.style.display==='none'){fp.style.display='block';}
-        document.getElementById('moodSection').style.display = 'block';
-        document.getElementById('ageSection').style.display = 'block';
-        document.getElementById('genreSection').style.display = 'block';
-      } else {
-        grid.innerHTML = '<div style="grid-column:1/-1;text-align:center;">No recommendations found.</div>';
-      }
-    }
-  </script>
-  <!-- Mood button handling -->
-  <script>
-    document.querySelectorAll('.mood-btn').forEach(btn => {
-      btn.addEventListener('click', () => {
-        if (!originalQuery) return; // need an initial query first
-        if (btn.classList.contains('selected')) {
-          btn.classList.remove('selected');
-          selectedMood = '';
-        } else {
-          document.querySelectorAll('.mood-btn').forEach(b => b.classList.remove('selected'));
-          btn.classList.add('selected');
-          selectedMood = btn.dataset.mood;
-        }
-        fetchRecommendations(buildFinalQuery());updateSummary();
-      });
-    });
-  </script>
-  <!-- Age button handling -->
-  <script>
-    document.querySelectorAll('.age-btn').forEach(btn => {
-      btn.addEventListener('click', () => {
-        if (!originalQuery) return;
-        if (btn.classList.contains('selected')) {
-          btn.classList.remove('selected');
-          selectedAge = '';
-        } else {
-          document.querySelectorAll('.age-btn').forEach(b => b.classList.remove('selected'));
-          btn.classList.add('selected');
-          selectedAge = btn.dataset.age;
-        }
-        fetchRecommendations(buildFinalQuery());updateSummary();
-      });
-    });
-  </script>
-  <!-- Genre button handling -->
-  <script>
-    document.querySelectorAll('.genre-btn').forEach(btn => {
-      btn.addEventListener('click', () => {
-        if (!originalQuery) return;
-        if (btn.classList.contains('selected')) {
-          btn.classList.remove('selected');
-          selectedGenre = '';
-        } else {
-          document.querySelectorAll('.genre-btn').forEach(b => b.classList.remove('selected'));
-          btn.classList.add('selected');
-          selectedGenre = btn.dataset.genre;
-        }
-        fetchRecommendations(buildFinalQuery());updateSummary();
-      });
-    });
-  </script>
-  <script>
-    const toggleBtn=document.getElementById('toggleFiltersBtn');
-    const filterContent=document.getElementById('filterContent');
-    function setToggleLabel(){
-      toggleBtn.textContent=filterContent.classList.contains('filters-collapsed')?'Show Filters ⬇️':'Hide Filters ⬆️';
-    }
-    toggleBtn.addEventListener('click',()=>{
-      filterContent.classList.toggle('filters-collapsed');
-      setToggleLabel();
-      localStorage.setItem('filtersHidden',filterContent.classList.contains('filters-collapsed'));
-    });
-    document.addEventListener('DOMContentLoaded',()=>{
-      const saved=localStorage.getItem('filtersHidden')==='true';
-      if(saved){filterContent.classList.add('filters-collapsed');setToggleLabel();}
-    });
-  </script>
-</body>
-</html>
-"""
-
-
-@app.get("/", response_class=HTMLResponse)
-async def root():
-    return HTML_PAGE 
\ No newline at end of file
+    async def stream():
+        # Send the transcript first so the UI can show it while recommendations are computed
+        yield orjson.dumps({"stage": "transcribed", "query": query_text}) + b"\n"
+        try:
+            recs = await state.batcher.submit(query_text, k)
+        except Exception as e:
+            logger.exception("Error processing /recommend_voice request")
+            yield orjson.dumps({"stage": "error", "detail": str(e)}) + b"\n"
+            return
+        # Note: poster URLs are now included in the metadata from our embedding system
+        yield orjson.dumps({"stage": "recs", "recs": recs}) + b"\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+# The page never changes at runtime, so read and gzip it once and let
+# browsers revalidate against a content hash instead of re-downloading it.
+# app.css / app.js are cached as immutable, so the page links them with a
+# content-hash query string that changes whenever the file does.
+HTML_TEXT = (STATIC_DIR / "index.html").read_text(encoding="utf-8")
+for _asset in ("app.css", "app.js"):
+    _version = hashlib.sha1((STATIC_DIR / _asset).read_bytes()).hexdigest()[:12]
+    HTML_TEXT = HTML_TEXT.replace(f'/static/{_asset}"', f'/static/{_asset}?v={_version}"')
+HTML_BYTES = HTML_TEXT.encode("utf-8")
+HTML_GZIP = gzip.compress(HTML_BYTES, compresslevel=9, mtime=0)
+HTML_ETAG = '"' + hashlib.sha1(HTML_BYTES).hexdigest() + '"'
+# Each encoding is its own representation and needs its own strong validator
+HTML_GZIP_ETAG = '"' + hashlib.sha1(HTML_GZIP).hexdigest() + '"'
+HTML_MTIME = int(max((STATIC_DIR / name).stat().st_mtime for name in ("index.html", "app.css", "app.js")))
+HTML_HEADERS = {
+    "ETag": HTML_ETAG,
+    "Last-Modified": formatdate(HTML_MTIME, usegmt=True),
+    "Cache-Control": "public, max-age=3600",
+    "Vary": "Accept-Encoding",
+}
+# 304s carry the validators of the variant the client would have been sent
+HTML_GZIP_VALIDATOR_HEADERS = {**HTML_HEADERS, "ETag": HTML_GZIP_ETAG}
+HTML_GZIP_HEADERS = {**HTML_GZIP_VALIDATOR_HEADERS, "Content-Encoding": "gzip"}
+
+
+def _html_not_modified(request: Request) -> bool:
+    """Conditional GET per RFC 9110: If-None-Match wins; If-Modified-Since is the fallback."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Proxies that re-compress may hand back a weak (W/) copy of our tag
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or HTML_ETAG in tags or HTML_GZIP_ETAG in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return parsedate_to_datetime(if_modified_since).timestamp() >= HTML_MTIME
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip, honouring q-values (q=0 refuses)."""
+    qvalues = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qvalues[coding.strip().lower()] = q
+    # An explicit gzip entry wins over the "*" wildcard
+    return qvalues.get("gzip", qvalues.get("*", 0.0)) > 0
+
+
+@app.api_route("/", methods=["GET", "HEAD"])
+async def root(request: Request):
+    use_gzip = _accepts_gzip(request.headers.get("accept-encoding", ""))
+    if _html_not_modified(request):
+        return Response(status_code=304, headers=HTML_GZIP_VALIDATOR_HEADERS if use_gzip else HTML_HEADERS)
+    if use_gzip:
+        return Response(content=HTML_GZIP, media_type="text/html; charset=utf-8", headers=HTML_GZIP_HEADERS)
+    return Response(content=HTML_BYTES, media_type="text/html; charset=utf-8", headers=HTML_HEADERS)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # Production launch: libuv event loop, C HTTP parser and one worker per core
+    # (override with WEB_CONCURRENCY). Each worker builds its own recommender.
+    uvicorn.run(
+        "api.app:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+    )
@@ -0,0 +1,126 @@
+"""Micro-batching of concurrent recommendation requests."""
+
+# Standard library
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+# Local imports
+from generator import VibeWatchRecommender
+
+logger = logging.getLogger(__name__)
+
+
+class RecommendBatcher:
+    """Coalesce requests arriving within a short window into one `recommend_batch` call.
+
+    Each caller awaits `submit()`; a background task drains the queue for up to
+    `max_wait_ms` (or `max_batch` items), groups the items by `k` and resolves
+    every caller's future from a single batched recommender call. Identical
+    `(user_query, k, signature)` submissions that are still in flight share
+    one future instead of being queued again.
+    """
+
+    def __init__(self, recommender: VibeWatchRecommender, max_batch: int = 32, max_wait_ms: float = 10.0):
+        self.recommender = recommender
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "asyncio.Queue[Tuple[str, int, str, asyncio.Future]]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._flushes: Set[asyncio.Task] = set()
+        self._inflight: Dict[Tuple[str, int, str], asyncio.Future] = {}
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop collecting, let running batches finish and fail whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Batches already handed to the recommender finish before the caller
+        # goes on to close the DB they may still write to
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+        # Queued items, and any the cancelled collector had taken off the
+        # queue but not flushed, are all in _inflight
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        for fut in list(self._inflight.values()):
+            if not fut.done():
+                fut.set_exception(RuntimeError("Recommender is shutting down"))
+
+    def inflight(self, user_query: str, k: int, signature: str = "") -> Optional[asyncio.Future]:
+        """Return the pending future for an identical submission, if one is being computed."""
+        return self._inflight.get((user_query, k, signature))
+
+    async def submit(self, user_query: str, k: int, signature: str = "") -> List[Dict[str, str]]:
+        """Recommend for one query; `signature` is its `filter_signature`."""
+        key = (user_query, k, signature)
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = asyncio.get_running_loop().create_future()
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda _: self._inflight.pop(key, None))
+            await self._queue.put((user_query, k, signature, fut))
+        # Shield so one caller disconnecting doesn't cancel the shared result
+        return await asyncio.shield(fut)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(items) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Flush in the background so the next window can start collecting
+            # while this batch waits on the embedding / LLM round-trips.
+            task = asyncio.create_task(self._flush(items))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, items: List[Tuple[str, int, str, asyncio.Future]]):
+        groups: Dict[int, List[Tuple[str, str, asyncio.Future]]] = defaultdict(list)
+        for user_query, k, signature, fut in items:
+            groups[k].append((user_query, signature, fut))
+        # Each k is its own recommender call; run them side by side so the
+        # UI's k=40 group never waits on an API k=10 group's round-trips
+        await asyncio.gather(*(self._flush_group(k, group) for k, group in groups.items()))
+
+    async def _flush_group(self, k: int, group: List[Tuple[str, str, asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        queries = [user_query for user_query, _, _ in group]
+        signatures = [signature for _, signature, _ in group]
+        futures = [fut for _, _, fut in group]
+        logger.debug("Flushing batch of %d queries (k=%d)", len(queries), k)
+
+        # Called from the worker thread as each query finishes, so a caller
+        # is answered without waiting for the slowest completion in the batch
+        def on_result(i: int, result):
+            loop.call_soon_threadsafe(_settle, futures[i], result)
+
+        try:
+            results = await asyncio.to_thread(self.recommender.recommend_batch, queries, k, signatures, on_result)
+        except Exception as e:
+            results = [e] * len(futures)
+        for fut, result in zip(futures, results):
+            _settle(fut, result)
+
+
+def _settle(fut: asyncio.Future, result):
+    """Resolve `fut` with a result, or fail it if `result` is an exception."""
+    if fut.done():
+        return
+    # A failed query only fails the callers waiting on that query
+    if isinstance(result, Exception):
+        fut.set_exception(result)
+    else:
+        fut.set_result(result)
@@ -0,0 +1,336 @@
+async function submit() {
+  const user_input = document.getElementById('queryBox').value.trim();
+  if (!user_input) {
+    const banner=document.getElementById('banner');
+    banner.style.display='block';
+    await surprise();
+    setTimeout(()=>{banner.style.display='none';},3000);
+    return;
+  }
+  originalQuery = user_input;
+  selectedMood = '';
+  selectedAge = '';
+  selectedGenre = '';
+  clearFilterButtons();
+  document.getElementById('moodSection').style.display = 'none';
+  document.getElementById('ageSection').style.display = 'none';
+  document.getElementById('genreSection').style.display = 'none';
+  fetchRecommendations(buildFinalQuery());updateSummary();
+}
+document.getElementById('queryBox').addEventListener('keydown', e => {
+  if (e.key === 'Enter' && e.ctrlKey) submit();
+});
+
+const micBtn = document.getElementById('micBtn');
+let mediaRecorder, audioChunks = [];
+
+// Whisper resamples to 16 kHz mono anyway, so record low-bitrate mono speech
+// and upload a fraction of the browser's default 48 kHz stereo stream.
+const VOICE_CONSTRAINTS = { audio: { channelCount: 1, sampleRate: 16000, echoCancellation: true, noiseSuppression: true } };
+const VOICE_MIME_TYPES = ['audio/webm;codecs=opus', 'audio/ogg;codecs=opus', 'audio/webm', 'audio/mp4'];
+const VOICE_BITRATE = 16000;
+
+// The mic stream is kept open between recordings so follow-up queries start
+// instantly, and released after a minute of inactivity or when the page goes.
+const MIC_IDLE_RELEASE_MS = 60000;
+let micStream = null, micReleaseTimer;
+
+async function getMicStream() {
+  clearTimeout(micReleaseTimer);
+  if (!micStream || micStream.getTracks().every(t => t.readyState === 'ended')) {
+    micStream = await navigator.mediaDevices.getUserMedia(VOICE_CONSTRAINTS);
+  }
+  return micStream;
+}
+
+function releaseMicStream() {
+  clearTimeout(micReleaseTimer);
+  if (micStream) micStream.getTracks().forEach(t => t.stop());
+  micStream = null;
+}
+
+window.addEventListener('pagehide', releaseMicStream);
+
+function createRecorder(stream) {
+  const mimeType = VOICE_MIME_TYPES.find(t => window.MediaRecorder && MediaRecorder.isTypeSupported(t));
+  const options = { audioBitsPerSecond: VOICE_BITRATE };
+  if (mimeType) options.mimeType = mimeType;
+  try {
+    return new MediaRecorder(stream, options);
+  } catch {
+    return new MediaRecorder(stream);
+  }
+}
+
+micBtn.addEventListener('click', async () => {
+  if (!mediaRecorder || mediaRecorder.state === 'inactive') {
+    try {
+      const stream = await getMicStream();
+      mediaRecorder = createRecorder(stream);
+      audioChunks = [];
+      mediaRecorder.ondataavailable = e => audioChunks.push(e.data);
+      mediaRecorder.onstop = () => {
+        const blob = new Blob(audioChunks, { type: mediaRecorder.mimeType || 'audio/webm' });
+        sendVoice(blob);
+        micReleaseTimer = setTimeout(releaseMicStream, MIC_IDLE_RELEASE_MS);
+      };
+      mediaRecorder.start();
+      micBtn.innerHTML = '⏹️ Stop';
+      micBtn.classList.add('rec');
+    } catch (err) {
+      alert('Microphone access denied');
+    }
+  } else if (mediaRecorder.state === 'recording') {
+    mediaRecorder.stop();
+    micBtn.innerHTML = '<img src="/images/vibewatch-microphone.svg" alt="microphone" style="width: 16px; height: 16px; margin-right: 6px; vertical-align: middle;"> Speak';
+    micBtn.classList.remove('rec');
+  }
+});
+
+// Call onEvent with each parsed line of an NDJSON response as it arrives;
+// stops with an AbortError as soon as `signal` is aborted
+async function readNdjson(resp, onEvent, signal) {
+  const reader = resp.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    signal?.throwIfAborted();
+    buffered += decoder.decode(value, { stream: true });
+    let nl;
+    while ((nl = buffered.indexOf('\n')) >= 0) {
+      const line = buffered.slice(0, nl).trim();
+      buffered = buffered.slice(nl + 1);
+      if (line) onEvent(JSON.parse(line));
+    }
+  }
+}
+
+async function sendVoice(blob) {
+  const signal = startRequest();
+  const grid = document.getElementById('resultsGrid');
+  const loading = document.getElementById('loading');
+  grid.innerHTML = '';
+  loading.style.display = 'block';
+  try {
+    const fd = new FormData();
+    // Whisper infers the container from the file extension
+    const ext = blob.type.includes('ogg') ? 'ogg' : blob.type.includes('mp4') ? 'mp4' : 'webm';
+    fd.append('file', blob, `voice.${ext}`);
+    fd.append('k', '40');
+    const resp = await fetch('/recommend_voice', { method: 'POST', body: fd, signal });
+    if (!resp.ok) {
+      let detail = resp.statusText;
+      try {
+        const errJson = await resp.json();
+        if (errJson && errJson.detail) detail = errJson.detail;
+      } catch {}
+      throw new Error(detail || `Server error (${resp.status})`);
+    }
+    // NDJSON stream: the transcript arrives first, recommendations follow
+    await readNdjson(resp, handleVoiceEvent, signal);
+  } catch (e) {
+    if (e.name === 'AbortError') return; // superseded by a newer request
+    loading.style.display = 'none';
+    grid.innerHTML = `<div style="grid-column:1/-1;text-align:center;color:var(--accent);">${e.message || 'Something went wrong. Please try again later.'}</div>`;
+  }
+}
+
+function handleVoiceEvent(evt) {
+  if (evt.stage === 'transcribed') {
+    originalQuery = evt.query || '';
+    document.getElementById('queryBox').value = originalQuery;
+  } else if (evt.stage === 'recs') {
+    document.getElementById('loading').style.display = 'none';
+    renderResults(evt.recs || []);
+  } else if (evt.stage === 'error') {
+    throw new Error(evt.detail);
+  }
+}
+
+async function surprise(){
+   if(!originalQuery){
+     originalQuery='Surprise me';
+     document.getElementById('queryBox').value='';
+   }
+   let query=buildFinalQuery();
+   if(!query){query='Surprise me with a great movie';}
+   else{query+=' (surprise me)';}
+   await fetchRecommendations(query, activeFilters({ surprise: 'yes' }));
+   updateSummary();
+}
+
+let originalQuery = '';
+let selectedMood = '';
+let selectedAge = '';
+let selectedGenre = '';
+
+// The same refinements as structured fields; the server keys its caches on these
+function activeFilters(extra) {
+  return { mood: selectedMood, age: selectedAge, genre: selectedGenre, ...extra };
+}
+
+function buildFinalQuery() {
+  let query = originalQuery;
+  if (selectedMood) query += ' that matches a ' + selectedMood + ' mood';
+  if (selectedAge) query += ' and is suitable for ' + selectedAge.toLowerCase();
+  if (selectedGenre) query += ' with ' + selectedGenre.toLowerCase() + ' genre';
+  return query;
+}
+
+// Filter clicks in quick succession collapse into one request, and every new
+// request (typed, surprise, voice or filter) cancels the one still in flight,
+// so a stale stream can never append cards to the new query's grid.
+const FILTER_DEBOUNCE_MS = 150;
+let pendingFetch, fetchCtrl;
+
+function cancelPendingRequests() {
+  clearTimeout(pendingFetch);
+  if (fetchCtrl) fetchCtrl.abort();
+  fetchCtrl = null;
+}
+
+function startRequest() {
+  cancelPendingRequests();
+  fetchCtrl = new AbortController();
+  return fetchCtrl.signal;
+}
+
+function scheduleFetch(queryText) {
+  cancelPendingRequests();
+  const filters = activeFilters();
+  pendingFetch = setTimeout(() => fetchRecommendations(queryText, filters), FILTER_DEBOUNCE_MS);
+}
+
+async function fetchRecommendations(queryText, filters = activeFilters()) {
+  const signal = startRequest();
+  const grid = document.getElementById('resultsGrid');
+  const loading = document.getElementById('loading');
+  grid.innerHTML = '';
+  loading.style.display = 'block';
+  try {
+    const resp = await fetch('/recommend_stream', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ user_input: queryText, k: 40, filters }),
+      signal
+    });
+    if (!resp.ok) {
+      let detail = resp.statusText;
+      try {
+        const errJson = await resp.json();
+        if (errJson && errJson.detail) detail = errJson.detail;
+      } catch {}
+      throw new Error(detail || `Server error (${resp.status})`);
+    }
+    // Cards are appended one by one as the server streams them
+    let count = 0;
+    await readNdjson(resp, evt => {
+      if (evt.stage === 'rec') {
+        if (count === 0) loading.style.display = 'none';
+        appendResult(evt.rec, count++);
+      } else if (evt.stage === 'error') {
+        throw new Error(evt.detail);
+      }
+    }, signal);
+    if (count === 0) renderResults([]);
+    loading.style.display = 'none';
+  } catch (e) {
+    if (e.name === 'AbortError') return; // superseded by a newer request
+    loading.style.display = 'none';
+    grid.innerHTML = `<div style="grid-column:1/-1;text-align:center;color:var(--accent);">${e.message || 'Something went wrong. Please try again later.'}</div>`;
+  }
+}
+
+function escapeHtml(value) {
+  return String(value ?? '').replace(/[&<>"']/g, ch => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[ch]));
+}
+
+const FALLBACK_POSTER = 'https://upload.wikimedia.org/wikipedia/commons/3/3e/Disney%2B_logo.svg';
+// Roughly the first row or two of the grid; these load immediately, the rest on scroll
+const EAGER_POSTERS = 6;
+
+function cardHtml(movie, idx) {
+  return `
+    <div class="movie-card">
+      <img src="${escapeHtml(movie.poster || FALLBACK_POSTER)}" ${idx < EAGER_POSTERS ? 'fetchpriority="high"' : 'loading="lazy" fetchpriority="low"'} decoding="async" alt="">
+      <div class="movie-info"><div class="movie-title">${idx + 1}. ${escapeHtml(movie.title)}</div><div class="movie-reason">${escapeHtml(movie.reason)}</div></div>
+    </div>`;
+}
+
+function showFilters() {
+  const fp=document.getElementById('filterPanel');
+  if(fp.style.display==='none'){fp.style.display='block';}
+  document.getElementById('moodSection').style.display = 'block';
+  document.getElementById('ageSection').style.display = 'block';
+  document.getElementById('genreSection').style.display = 'block';
+}
+
+function renderResults(recs) {
+  const grid = document.getElementById('resultsGrid');
+  if (Array.isArray(recs) && recs.length) {
+    // Build every card as one string so the grid is written (and laid out) once
+    grid.innerHTML = recs.map(cardHtml).join('');
+    showFilters();
+  } else {
+    grid.innerHTML = '<div style="grid-column:1/-1;text-align:center;">No recommendations found.</div>';
+  }
+}
+
+function appendResult(movie, idx) {
+  const grid = document.getElementById('resultsGrid');
+  if (idx === 0) showFilters();
+  grid.insertAdjacentHTML('beforeend', cardHtml(movie, idx));
+}
+
+// Mood / age / genre buttons: one delegated listener, remembering the selected
+// button per group so a click only touches the old and new selection.
+const FILTER_GROUPS = { 'mood-btn': 'mood', 'age-btn': 'age', 'genre-btn': 'genre' };
+const selectedBtns = { mood: null, age: null, genre: null };
+
+function setFilter(group, value) {
+  if (group === 'mood') selectedMood = value;
+  else if (group === 'age') selectedAge = value;
+  else selectedGenre = value;
+}
+
+function clearFilterButtons() {
+  for (const group in selectedBtns) {
+    if (selectedBtns[group]) selectedBtns[group].classList.remove('selected');
+    selectedBtns[group] = null;
+  }
+}
+
+document.addEventListener('click', e => {
+  const btn = e.target.closest('.knob-btn');
+  if (!btn || !originalQuery) return; // need an initial query first
+  const group = FILTER_GROUPS[[...btn.classList].find(c => c in FILTER_GROUPS)];
+  if (!group) return;
+  const prev = selectedBtns[group];
+  if (prev) prev.classList.remove('selected');
+  if (prev === btn) {
+    selectedBtns[group] = null;
+    setFilter(group, '');
+  } else {
+    btn.classList.add('selected');
+    selectedBtns[group] = btn;
+    setFilter(group, btn.dataset[group]);
+  }
+  scheduleFetch(buildFinalQuery());updateSummary();
+});
+
+const toggleBtn=document.getElementById('toggleFiltersBtn');
+const filterContent=document.getElementById('filterContent');
+function setToggleLabel(){
+  toggleBtn.textContent=filterContent.classList.contains('filters-collapsed')?'Show Filters ⬇️':'Hide Filters ⬆️';
+}
+toggleBtn.addEventListener('click',()=>{
+  filterContent.classList.toggle('filters-collapsed');
+  setToggleLabel();
+  localStorage.setItem('filtersHidden',filterContent.classList.contains('filters-collapsed'));
+});
+document.addEventListener('DOMContentLoaded',()=>{
+  const saved=localStorage.getItem('filtersHidden')==='true';
+  if(saved){filterContent.classList.add('filters-collapsed');setToggleLabel();}
+});
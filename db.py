@@ -1,24 +1,57 @@
 # Python 3.9-compatible type hints
 from __future__ import annotations
 
+import logging
+import queue
 import sqlite3
 import datetime
 import threading
+import time
 from pathlib import Path
-from typing import Optional, Union
+from typing import Dict, Optional, Union
 
 
+logger = logging.getLogger(__name__)
+
 _db_lock = threading.Lock()
 # Use Optional for pre-3.10 compatibility
 _conn: Optional[sqlite3.Connection] = None
 
+# Seconds a statement waits on another worker's write lock before failing
+# with "database is locked"
+_CONNECT_TIMEOUT_S = 10.0
+
+# Query-log rows are queued by request handlers and written in batches by one
+# background thread, so a request never waits on an INSERT + commit. The queue
+# is bounded: if the writer falls behind, new rows are dropped and counted
+# rather than piling up in memory.
+_LOG_BATCH_SIZE = 100
+_LOG_QUEUE_MAX = 10_000
+_log_queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=_LOG_QUEUE_MAX)
+_log_writer: Optional[threading.Thread] = None
+_dropped_logs = 0
+
+# The hash-keyed caches expire and are capped at their newest rows: Whisper
+# transcripts are user speech and shouldn't be kept indefinitely, and a
+# temperature > 0 completion shouldn't be replayed forever. Each table is
+# pruned at start-up and then every _PRUNE_EVERY saves to it.
+TRANSCRIPTION_TTL_S = 24 * 60 * 60
+TRANSCRIPTION_MAX_ROWS = 10_000
+LLM_RESPONSE_TTL_S = 24 * 60 * 60
+LLM_RESPONSE_MAX_ROWS = 10_000
+_PRUNE_EVERY = 100
+_saves: Dict[str, int] = {}  # table -> saves since start-up
+
 
 def init_db(db_path: Union[str, Path] = "data/queries.db"):
     """Initialise SQLite database and ensure table exists."""
-    global _conn
+    global _conn, _log_writer
     db_path = Path(db_path)
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    _conn = sqlite3.connect(db_path, check_same_thread=False)
+    _conn = sqlite3.connect(db_path, timeout=_CONNECT_TIMEOUT_S, check_same_thread=False)
+    # WAL lets reads proceed during writes; NORMAL skips the fsync per commit
+    _conn.execute("PRAGMA journal_mode=WAL")
+    _conn.execute("PRAGMA synchronous=NORMAL")
     _conn.execute(
         """
         CREATE TABLE IF NOT EXISTS queries (
@@ -29,15 +62,155 @@ def init_db(db_path: Union[str, Path] = "data/queries.db"):
         )
         """
     )
+    # Whisper transcripts keyed by SHA-256 of the uploaded audio, so re-sent
+    # clips skip the API call (and stay cached across restarts until they expire)
+    _conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transcriptions (
+            hash TEXT PRIMARY KEY,
+            text TEXT NOT NULL,
+            created REAL NOT NULL DEFAULT 0
+        )
+        """
+    )
+    # Raw LLM responses keyed by SHA-256 of model + prompt messages, shared by
+    # all workers and kept across restarts until they expire
+    _conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS llm_responses (
+            hash TEXT PRIMARY KEY,
+            content TEXT NOT NULL,
+            created REAL NOT NULL DEFAULT 0
+        )
+        """
+    )
+    for table in ("transcriptions", "llm_responses"):
+        columns = {row[1] for row in _conn.execute(f"PRAGMA table_info({table})")}
+        if "created" not in columns:
+            # Tables from before expiry: old rows get created=0 and are pruned below
+            _conn.execute(f"ALTER TABLE {table} ADD COLUMN created REAL NOT NULL DEFAULT 0")
+        _conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_created ON {table} (created)")
+    _prune_cache("transcriptions", TRANSCRIPTION_TTL_S, TRANSCRIPTION_MAX_ROWS)
+    _prune_cache("llm_responses", LLM_RESPONSE_TTL_S, LLM_RESPONSE_MAX_ROWS)
     _conn.commit()
 
+    if _log_writer is None or not _log_writer.is_alive():
+        _log_writer = threading.Thread(target=_write_logs, name="query-log-writer", daemon=True)
+        _log_writer.start()
+
+
+def is_initialised() -> bool:
+    return _conn is not None
+
+
+def close_db():
+    """Flush queued query logs and close the connection."""
+    global _conn, _log_writer
+    if _log_writer is not None:
+        _log_queue.put(None)
+        _log_writer.join()
+        _log_writer = None
+    if _conn is not None:
+        with _db_lock:
+            _conn.close()
+        _conn = None
+
+
+def _write_logs():
+    while True:
+        rows = [_log_queue.get()]
+        # Drain whatever else is already queued into the same transaction
+        while len(rows) < _LOG_BATCH_SIZE:
+            try:
+                rows.append(_log_queue.get_nowait())
+            except queue.Empty:
+                break
+        stop = None in rows
+        rows = [row for row in rows if row is not None]
+        if rows:
+            # A failed batch is logged and dropped; the writer must outlive it,
+            # or nothing would drain the queue again
+            try:
+                with _db_lock:
+                    _conn.executemany("INSERT INTO queries (ts, endpoint, query) VALUES (?, ?, ?)", rows)
+                    _conn.commit()
+            except sqlite3.Error:
+                logger.exception("Failed to write %d query log rows", len(rows))
+                try:
+                    with _db_lock:
+                        _conn.rollback()
+                except sqlite3.Error:
+                    pass
+        if stop:
+            return
+
 
 # No change needed here – Python 3.9 supports plain str annotations
 def log_query(endpoint: str, query: str):
-    """Persist a query + endpoint + UTC timestamp."""
+    """Queue a query + endpoint + UTC timestamp for the background writer."""
     if _conn is None:
         raise RuntimeError("DB not initialised. Call init_db() first.")
+    global _dropped_logs
     ts = datetime.datetime.utcnow().isoformat()
+    try:
+        _log_queue.put_nowait((ts, endpoint, query))
+    except queue.Full:
+        _dropped_logs += 1
+        if _dropped_logs == 1 or _dropped_logs % 1000 == 0:
+            logger.warning("Query log queue full; %d rows dropped so far", _dropped_logs)
+
+
+def get_transcription(audio_hash: str) -> Optional[str]:
+    """Return the cached transcript for an audio SHA-256, or None if absent or expired."""
+    return _cache_get("transcriptions", "text", audio_hash, TRANSCRIPTION_TTL_S)
+
+
+def save_transcription(audio_hash: str, text: str):
+    """Cache a transcript under the SHA-256 of its audio."""
+    _cache_put("transcriptions", "text", audio_hash, text, TRANSCRIPTION_TTL_S, TRANSCRIPTION_MAX_ROWS)
+
+
+def get_llm_response(prompt_hash: str) -> Optional[str]:
+    """Return the cached LLM response for a prompt SHA-256, or None if absent or expired."""
+    return _cache_get("llm_responses", "content", prompt_hash, LLM_RESPONSE_TTL_S)
+
+
+def save_llm_response(prompt_hash: str, content: str):
+    """Cache an LLM response under the SHA-256 of its prompt."""
+    _cache_put("llm_responses", "content", prompt_hash, content, LLM_RESPONSE_TTL_S, LLM_RESPONSE_MAX_ROWS)
+
+
+# Table and column names below always come from this module, never from input
+
+def _cache_get(table: str, column: str, key: str, ttl_s: float) -> Optional[str]:
+    if _conn is None:
+        raise RuntimeError("DB not initialised. Call init_db() first.")
+    with _db_lock:
+        row = _conn.execute(
+            f"SELECT {column} FROM {table} WHERE hash = ? AND created >= ?",
+            (key, time.time() - ttl_s),
+        ).fetchone()
+    return row[0] if row else None
+
+
+def _cache_put(table: str, column: str, key: str, value: str, ttl_s: float, max_rows: int):
+    if _conn is None:
+        raise RuntimeError("DB not initialised. Call init_db() first.")
     with _db_lock:
-        _conn.execute("INSERT INTO queries (ts, endpoint, query) VALUES (?, ?, ?)", (ts, endpoint, query))
-        _conn.commit() 
\ No newline at end of file
+        _conn.execute(
+            f"INSERT OR REPLACE INTO {table} (hash, {column}, created) VALUES (?, ?, ?)",
+            (key, value, time.time()),
+        )
+        _saves[table] = _saves.get(table, 0) + 1
+        if _saves[table] % _PRUNE_EVERY == 0:
+            _prune_cache(table, ttl_s, max_rows)
+        _conn.commit()
+
+
+def _prune_cache(table: str, ttl_s: float, max_rows: int):
+    """Drop expired rows and all but the newest `max_rows` (caller holds the lock and commits)."""
+    _conn.execute(f"DELETE FROM {table} WHERE created < ?", (time.time() - ttl_s,))
+    _conn.execute(
+        f"DELETE FROM {table} WHERE hash NOT IN (SELECT hash FROM {table} ORDER BY created DESC LIMIT ?)",
+        (max_rows,),
+    )
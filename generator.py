@@ -1,17 +1,20 @@
-import json
-import re
-from typing import List, Dict
+import hashlib
+import unicodedata
+from typing import Callable, Iterator, List, Dict, Optional, Tuple, Union
 
 # Third-party
+import orjson
 from langchain_openai import ChatOpenAI
-from langchain.schema import BaseMessage
+from langchain.schema import BaseMessage, HumanMessage, SystemMessage
 
 # Standard library
 import logging
 
 # Local imports
+import db
 import retriever
-from prompting import PROMPT_TEMPLATE
+from prompting import SYSTEM_PROMPT, USER_PROMPT
+from semantic_cache import SemanticCache
 
 # ---------------------------------------------------------------------------
 # Logging
@@ -19,46 +22,206 @@ from prompting import PROMPT_TEMPLATE
 
 logger = logging.getLogger(__name__)
 
+# A query's recommendations, or the exception that stopped them
+BatchResult = Union[List[Dict[str, str]], Exception]
+
+# The system message never changes; only the user message is formatted per call
+_SYSTEM_MESSAGE = SystemMessage(content=SYSTEM_PROMPT)
 
 class VibeWatchRecommender:
     """Simple wrapper around retriever + LLM generator."""
 
-    def __init__(self, openai_api_key: str, model_name: str = "gpt-4o", temperature: float = 0.7):
+    def __init__(self, openai_api_key: str, model_name: str = "gpt-4o", temperature: float = 0.7,
+                 cache_threshold: float = 0.97, cache_size: int = 512):
         self.llm = ChatOpenAI(model=model_name, openai_api_key=openai_api_key, temperature=temperature)
+        # Near-duplicate queries (cosine >= cache_threshold) reuse earlier recommendations
+        self.cache = SemanticCache(threshold=cache_threshold, max_size=cache_size)
+
+    def recommend(self, user_query: str, k: int = 5, signature: str = "") -> List[Dict[str, str]]:
+        """Recommend for one query; `signature` is its `filter_signature`, part of the cache key."""
+        cached = self.cache.get_exact(user_query, k, signature)
+        if cached is not None:
+            logger.debug("Exact cache hit for %r", user_query)
+            return cached
 
-    def recommend(self, user_query: str, k: int = 5) -> List[Dict[str, str]]:
-        docs = retriever.retrieve(user_query, k=k)
+        embedding = retriever.embed_query(user_query)
+        cached = self.cache.get(embedding, k, signature)
+        if cached is not None:
+            logger.debug("Semantic cache hit for %r", user_query)
+            return cached
 
-        prompt = PROMPT_TEMPLATE.format_prompt(user_query=user_query, retrieved_docs=json.dumps(docs, ensure_ascii=False))
-        messages: List[BaseMessage] = prompt.to_messages()
+        docs = retriever.retrieve_by_vector(embedding, k=k)
+        messages = self._build_messages(user_query, docs)
+        key = self._response_key(messages)
+        content = self._load_response(key)
+        if content is not None:
+            return self._finish(user_query, content, docs, embedding, k, signature)
         response = self.llm(messages)
+        return self._finish(user_query, response.content, docs, embedding, k, signature, response_key=key)
+
+    def recommend_batch(self, user_queries: List[str], k: int = 5, signatures: Optional[List[str]] = None,
+                        on_result: Optional[Callable[[int, BatchResult], None]] = None) -> List[BatchResult]:
+        """Recommend for several queries at once: one embedding call, one FAISS search, concurrent LLM calls.
+
+        A query whose LLM call or response handling fails gets its exception in
+        place of a result, so one bad completion doesn't fail the rest of the
+        batch. `on_result(index, result)` is called as soon as each query's
+        result is known, so callers need not wait for the slowest completion.
+        `signatures` holds each query's `filter_signature` (all "" if omitted).
+        """
+        if signatures is None:
+            signatures = [""] * len(user_queries)
+        results: List[Optional[BatchResult]] = [None] * len(user_queries)
+
+        def settle(i: int, result: BatchResult):
+            results[i] = result
+            if on_result is not None:
+                on_result(i, result)
+
+        def finish(i: int, content: str, response_key: Optional[str] = None):
+            try:
+                recs = self._finish(user_queries[i], content, docs_per_query[i], embeddings[i], k,
+                                    signatures[i], response_key=response_key)
+            except Exception as e:
+                logger.warning("Could not use the LLM response for %r: %s", user_queries[i], e)
+                recs = e
+            settle(i, recs)
+
+        # Exact repeats are answered before anything is sent to the embedding API
+        for i, user_query in enumerate(user_queries):
+            cached = self.cache.get_exact(user_query, k, signatures[i])
+            if cached is not None:
+                settle(i, cached)
+        to_embed = [i for i, recs in enumerate(results) if recs is None]
+        if not to_embed:
+            return results
+
+        embeddings = dict(zip(to_embed, retriever.embed_queries([user_queries[i] for i in to_embed])))
+        for i in to_embed:
+            cached = self.cache.get(embeddings[i], k, signatures[i])
+            if cached is not None:
+                settle(i, cached)
+        misses = [i for i in to_embed if results[i] is None]
+        if not misses:
+            return results
+
+        docs_per_query = dict(zip(misses, retriever.retrieve_by_vectors([embeddings[i] for i in misses], k=k)))
+        messages = {i: self._build_messages(user_queries[i], docs_per_query[i]) for i in misses}
+        keys = {i: self._response_key(messages[i]) for i in misses}
+        to_call = []
+        for i in misses:
+            content = self._load_response(keys[i])
+            if content is None:
+                to_call.append(i)
+            else:
+                finish(i, content)
+        if not to_call:
+            return results
+
+        # Completions are handled in the order they finish, not the order sent
+        for j, response in self.llm.batch_as_completed([messages[i] for i in to_call], return_exceptions=True):
+            i = to_call[j]
+            if isinstance(response, Exception):
+                logger.warning("LLM call failed for %r: %s", user_queries[i], response)
+                settle(i, response)
+            else:
+                finish(i, response.content, response_key=keys[i])
+        return results
+
+    def recommend_stream(self, user_query: str, k: int = 5, signature: str = "") -> Iterator[Dict[str, str]]:
+        """Yield recommendations one at a time as the LLM writes them; cache hits come out at once."""
+        cached = self.cache.get_exact(user_query, k, signature)
+        if cached is None:
+            embedding = retriever.embed_query(user_query)
+            cached = self.cache.get(embedding, k, signature)
+        if cached is not None:
+            logger.debug("Cache hit for %r", user_query)
+            yield from cached
+            return
+
+        docs = retriever.retrieve_by_vector(embedding, k=k)
+        messages = self._build_messages(user_query, docs)
+        key = self._response_key(messages)
+        content = self._load_response(key)
+        if content is not None:
+            yield from self._finish(user_query, content, docs, embedding, k, signature)
+            return
+
+        parser = _JSONArrayStream()
+        recs: List[Dict[str, str]] = []
+        parts: List[str] = []
+        for chunk in self.llm.stream(messages):
+            parts.append(chunk.content)
+            for rec in parser.feed(chunk.content):
+                rec = self._enrich_with_posters([rec], docs)[0]
+                recs.append(rec)
+                yield rec
+        if not recs:
+            yield from self._fallback(docs)
+        elif parser.done:
+            self.cache.put(embedding, k, recs, query=user_query, signature=signature)
+            self._store_response(key, "".join(parts))
+        else:
+            # The array never closed (e.g. cut off at the token limit): keep what
+            # was streamed, but don't cache a response that won't parse again
+            logger.warning("Streamed response for %r ended before the array closed", user_query)
+
+    def _finish(self, user_query: str, content: str, docs: List[Dict], embedding: List[float],
+                k: int, signature: str = "", response_key: Optional[str] = None) -> List[Dict[str, str]]:
+        recs = self._parse_recommendations(content, docs)
+        if recs is None:
+            return self._fallback(docs)
+        self.cache.put(embedding, k, recs, query=user_query, signature=signature)
+        if response_key is not None:
+            self._store_response(response_key, content)
+        return recs
+
+    def _response_key(self, messages: List[BaseMessage]) -> str:
+        """SHA-256 of the model name and prompt messages, for the persistent response cache."""
+        h = hashlib.sha256(self.llm.model_name.encode())
+        for message in messages:
+            h.update(b"\0" + message.type.encode() + b"\0" + message.content.encode())
+        return h.hexdigest()
+
+    @staticmethod
+    def _load_response(key: str) -> Optional[str]:
+        # The response cache lives in the app's SQLite DB; without it every call hits the API
+        return db.get_llm_response(key) if db.is_initialised() else None
+
+    @staticmethod
+    def _store_response(key: str, content: str):
+        if db.is_initialised():
+            db.save_llm_response(key, content)
+
+    def _build_messages(self, user_query: str, docs: List[Dict]) -> List[BaseMessage]:
+        # Same messages as PROMPT_TEMPLATE.format_prompt(...).to_messages(), minus
+        # LangChain's template machinery on every request
+        user_prompt = USER_PROMPT.format(user_query=user_query, retrieved_docs=orjson.dumps(docs).decode())
+        return [_SYSTEM_MESSAGE, HumanMessage(content=user_prompt)]
 
+    def _parse_recommendations(self, content: str, docs: List[Dict]) -> Optional[List[Dict[str, str]]]:
+        """Parse the LLM's JSON array and attach posters; None if the response is unusable."""
         # Debug: log the raw response
-        logger.debug("Raw LLM response: %s", response.content)
-        # Try to extract JSON from the response
-        content = response.content.strip()
-        
-        # Look for JSON array in the response
-        json_match = re.search(r'\[.*\]', content, re.DOTALL)
-        if json_match:
-            json_str = json_match.group()
+        logger.debug("Raw LLM response: %s", content)
+
+        # One pass over the text finds the array whether it is bare, fenced or
+        # surrounded by prose; if a bracketed bit of prose comes first, move on
+        start = 0
+        while True:
+            span = _find_json_array(content, start)
+            if span is None:
+                return None
             try:
-                recs = json.loads(json_str)
+                recs = orjson.loads(content[span[0]:span[1]])
+            except orjson.JSONDecodeError as e:
+                logger.debug("JSON parsing error: %s", e)
+            else:
                 if isinstance(recs, list):
                     # Enrich LLM recommendations with poster URLs from original docs
                     return self._enrich_with_posters(recs, docs)
-            except json.JSONDecodeError as e:
-                logger.debug("JSON parsing error: %s", e)
-        
-        # Try parsing the entire content as JSON
-        try:
-            recs = json.loads(content)
-            if isinstance(recs, list):
-                # Enrich LLM recommendations with poster URLs from original docs
-                return self._enrich_with_posters(recs, docs)
-        except json.JSONDecodeError as e:
-            logger.debug("Full content JSON parsing error: %s", e)
+            start = span[0] + 1
 
+    def _fallback(self, docs: List[Dict]) -> List[Dict[str, str]]:
         # Fallback: pass-through with docs (preserve all metadata including poster)
         return [
             {
@@ -70,43 +233,147 @@ class VibeWatchRecommender:
     
     def _enrich_with_posters(self, recs: List[Dict], docs: List[Dict]) -> List[Dict]:
         """Enrich LLM recommendations with poster URLs by matching titles"""
-        # Create a lookup map from title to poster URL
+        # Build the lookups once per call: exact title, then case/unicode-normalised
+        # title, with the normalised list kept for the substring fallback.
         title_to_poster = {doc.get("title", ""): doc.get("poster") for doc in docs}
-        
-        # Debug: log available titles and their poster status
-        logger.debug("Available titles and posters:")
+        norm_to_poster = {}
         for title, poster in title_to_poster.items():
-            poster_status = "✓ HAS POSTER" if poster else "✗ NO POSTER"
-            logger.debug("  '%s' -> %s", title, poster_status)
-            if poster:
-                logger.debug("    URL: %s", poster)
-        
-        logger.debug("LLM recommended titles:")
-        # Add poster URLs to recommendations
+            norm_to_poster.setdefault(_normalize_title(title), poster)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Available titles and posters:")
+            for title, poster in title_to_poster.items():
+                logger.debug("  '%s' -> %s", title, poster or "✗ NO POSTER")
+
         for rec in recs:
             title = rec.get("title", "")
-            logger.debug("  Looking for: '%s'", title)
-            
             # Initialize poster as None to ensure the key always exists
             rec["poster"] = None
-            
+
             if title in title_to_poster:
                 rec["poster"] = title_to_poster[title]
-                logger.debug("    ✓ MATCHED -> %s", title_to_poster[title])
+                continue
+
+            norm = _normalize_title(title)
+            if not norm:
+                continue
+            if norm in norm_to_poster:
+                rec["poster"] = norm_to_poster[norm]
+                logger.debug("  '%s' matched after normalisation", title)
+                continue
+
+            # Fuzzy fallback: one title contains the other
+            for doc_norm, poster in norm_to_poster.items():
+                if norm in doc_norm or doc_norm in norm:
+                    rec["poster"] = poster
+                    logger.debug("  '%s' fuzzy-matched '%s'", title, doc_norm)
+                    break
             else:
-                logger.debug("    ✗ NO MATCH FOUND")
-                # Try fuzzy matching
-                for doc_title in title_to_poster:
-                    # Safely compare by casting to string to avoid errors if title is not str
-                    title_str = str(title).lower()
-                    doc_title_str = str(doc_title).lower()
-                    if title_str in doc_title_str or doc_title_str in title_str:
-                        rec["poster"] = title_to_poster[doc_title]
-                        logger.debug("    ~ FUZZY MATCH: '%s' -> '%s' -> %s", title, doc_title, title_to_poster[doc_title])
-                        break
-                
-                # If still no poster found, keep it as None (but key exists)
-                if rec["poster"] is None:
-                    logger.debug("    ✗ NO POSTER AVAILABLE - will use placeholder")
-        
-        return recs 
\ No newline at end of file
+                logger.debug("  '%s' has no poster - will use placeholder", title)
+
+        return recs
+
+
+def _normalize_title(title) -> str:
+    """Casefolded, unicode-normalised title used for poster matching."""
+    return unicodedata.normalize("NFKC", str(title)).casefold().strip()
+
+
+def _find_json_array(text: str, start: int = 0) -> Optional[Tuple[int, int]]:
+    """Return the (start, end) slice of the first balanced `[...]` at or after `start`.
+
+    Brackets inside JSON strings are ignored. Single pass, no backtracking.
+    """
+    begin = text.find("[", start)
+    if begin < 0:
+        return None
+    depth = 0
+    in_string = escaped = False
+    for pos in range(begin, len(text)):
+        ch = text[pos]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "[":
+            depth += 1
+        elif ch == "]":
+            depth -= 1
+            if depth == 0:
+                return begin, pos + 1
+    return None
+
+
+class _JSONArrayStream:
+    """Pull complete objects out of a JSON array while it is still being streamed.
+
+    Text before the array (e.g. a markdown fence or a sentence of preamble) is
+    skipped: a `[` only opens the array when the next non-space character is
+    `{` or `]`. Each top-level `{...}` is returned from `feed` as soon as its
+    closing brace arrives, and everything after the array's closing `]` is
+    ignored.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._in_string = False
+        self._escaped = False
+        self._depth = 0  # nesting inside the array, which itself is depth 1
+        self._obj_start = 0
+
+    @property
+    def done(self) -> bool:
+        """Whether the array's closing `]` has been seen."""
+        return self._done
+
+    def feed(self, text: str) -> List[Dict]:
+        if self._done:
+            return []
+        self._buf += text
+        objs = []
+        while self._pos < len(self._buf):
+            ch = self._buf[self._pos]
+            if not self._in_array:
+                if ch == "[":
+                    rest = self._buf[self._pos + 1:].lstrip()
+                    if not rest:
+                        break  # can't tell yet whether this opens the array
+                    if rest[0] in "{]":
+                        self._in_array = True
+                        self._depth = 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if ch == "{" and self._depth == 1:
+                    self._obj_start = self._pos
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._done = True
+                    break
+                if ch == "}" and self._depth == 1:
+                    try:
+                        obj = orjson.loads(self._buf[self._obj_start:self._pos + 1])
+                    except orjson.JSONDecodeError as e:
+                        logger.debug("Skipping unparsable streamed object: %s", e)
+                    else:
+                        if isinstance(obj, dict):
+                            objs.append(obj)
+            self._pos += 1
+        return objs
@@ -1,40 +1,89 @@
-import json
 from pathlib import Path
 from typing import List, Dict
 
+import faiss
+import httpx
+import numpy as np
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 
 DATA_DIR = Path(__file__).resolve().parent / "data"
 INDEX_DIR = DATA_DIR / "faiss_index"
 EMBED_MODEL = "text-embedding-3-small"
+# Candidate list size for HNSW indexes; higher trades speed for recall.
+HNSW_EF_SEARCH = 64
 
 _embeddings = None
 _vectorstore = None
-_metadata = None
 
 
 def _load_vectorstore():
-    global _embeddings, _vectorstore, _metadata
+    global _embeddings, _vectorstore
     if _vectorstore is not None:
         return
 
     if not INDEX_DIR.exists():
         raise FileNotFoundError("FAISS index not found. Run build_embeddings.py first.")
 
-    _embeddings = OpenAIEmbeddings(model=EMBED_MODEL)
+    # Query embeddings reuse one pooled HTTP/2 connection instead of a fresh handshake
+    _embeddings = OpenAIEmbeddings(
+        model=EMBED_MODEL,
+        http_client=httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=30.0),
+            timeout=httpx.Timeout(60.0, connect=5.0),
+        ),
+    )
     _vectorstore = FAISS.load_local(str(INDEX_DIR), embeddings=_embeddings, allow_dangerous_deserialization=True)
+    if isinstance(_vectorstore.index, faiss.IndexHNSW):
+        _vectorstore.index.hnsw.efSearch = HNSW_EF_SEARCH
 
-    meta_path = INDEX_DIR / "metadata.json"
-    if meta_path.exists():
-        _metadata = {int(item["id"]): item for item in json.loads(meta_path.read_text())}
-    else:
-        _metadata = {}
+
+def warmup():
+    """Load the FAISS index eagerly and run one dummy search so its pages are resident."""
+    _load_vectorstore()
+    index = _vectorstore.index
+    index.search(np.zeros((1, index.d), dtype=np.float32), 1)
+
+
+def embed_query(query: str) -> List[float]:
+    """Return the embedding vector for a query."""
+    _load_vectorstore()
+    return _embeddings.embed_query(query)
+
+
+def embed_queries(queries: List[str]) -> List[List[float]]:
+    """Return embedding vectors for several queries using a single API call."""
+    _load_vectorstore()
+    return _embeddings.embed_documents(queries)
+
+
+def retrieve_by_vector(embedding: List[float], k: int = 5) -> List[Dict]:
+    """Return top-k movie metadata dicts for an already-computed query embedding."""
+    _load_vectorstore()
+    docs = _vectorstore.similarity_search_by_vector(embedding, k=k)
+    return [doc.metadata for doc in docs]
+
+
+def retrieve_by_vectors(embeddings: List[List[float]], k: int = 5) -> List[List[Dict]]:
+    """Return top-k movie metadata dicts for each embedding, using one FAISS search for all."""
+    _load_vectorstore()
+    if not len(embeddings):
+        return []
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if _vectorstore._normalize_L2:
+        faiss.normalize_L2(vectors)
+    _, indices = _vectorstore.index.search(vectors, k)
+    docstore, ids = _vectorstore.docstore, _vectorstore.index_to_docstore_id
+    # -1 pads the row when the index holds fewer than k vectors
+    return [[docstore.search(ids[i]).metadata for i in row if i != -1] for row in indices]
 
 
 def retrieve(query: str, k: int = 5) -> List[Dict]:
     """Return top-k movie metadata dicts for the query."""
-    _load_vectorstore()
-    docs = _vectorstore.similarity_search(query, k=k)
-    results = [doc.metadata for doc in docs]
-    return results 
\ No newline at end of file
+    return retrieve_by_vector(embed_query(query), k=k)
+
+
+def retrieve_batch(queries: List[str], k: int = 5) -> List[List[Dict]]:
+    """Return top-k movie metadata dicts for each query, embedding all queries in one API call."""
+    return retrieve_by_vectors(embed_queries(queries), k=k)
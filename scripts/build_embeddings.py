@@ -1,123 +1,240 @@
+import argparse
+import ast
+import asyncio
+import hashlib
 import json
+from functools import lru_cache
 from pathlib import Path
+from typing import List
 
+import faiss
+import httpx
+import numpy as np
+import orjson
 import pandas as pd
 from langchain.docstore.document import Document
 from langchain_community.embeddings import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
+from openai import AsyncOpenAI
 
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
 MOVIES_CSV = DATA_DIR / "movies_disney_hulu.csv"
 INDEX_DIR = DATA_DIR / "faiss_index"
+# One .npy per distinct text, so rebuilds only embed new or changed rows
+EMBED_CACHE_DIR = DATA_DIR / "embeddings_cache"
 
 EMBED_MODEL = "text-embedding-3-small"
+# Catalogue columns used to build the documents; the rest are never loaded
+DOCUMENT_COLUMNS = ["title", "name", "overview", "tagline", "genres", "images"]
+# faiss.index_factory description of the stored index. "HNSW32" searches a
+# graph with 32 links per node instead of scanning every vector; "SQfp16"
+# stores the vectors as float16 (use "SQ8" for int8, or "Flat" alone for the
+# old exact brute-force index).
+INDEX_FACTORY = "HNSW32,SQfp16"
+HNSW_EF_CONSTRUCTION = 200
+# Texts per embeddings request and how many requests may be in flight at once.
+EMBED_BATCH_SIZE = 512
+EMBED_CONCURRENCY = 8
+# The OpenAI client retries 429s and 5xx responses with exponential backoff.
+EMBED_MAX_RETRIES = 6
 
 
 def load_movies() -> pd.DataFrame:
     if not MOVIES_CSV.exists():
         raise FileNotFoundError("movies_disney_hulu.csv not found.")
-    return pd.read_csv(MOVIES_CSV)
+    # Only parse the columns create_documents reads
+    return pd.read_csv(MOVIES_CSV, usecols=lambda col: col in DOCUMENT_COLUMNS)
 
 
 def extract_poster_url(images_data):
     """Extract poster URL from the images JSON data"""
     if not images_data or pd.isna(images_data):
         return None
-    
+
+    images_str = str(images_data).strip()
+    # Skip empty or 'nan' strings
+    if not images_str or images_str.lower() in ['nan', 'none']:
+        return None
+
     try:
-        # Handle different possible formats
-        images_str = str(images_data).strip()
-        
-        # Skip empty or 'nan' strings
-        if not images_str or images_str.lower() in ['nan', 'none', '']:
-            return None
-            
-        # Parse the JSON string
-        import ast, json
-        
-        # Try json.loads first (proper JSON)
         try:
-            images_dict = json.loads(images_str)
-        except:
-            # Fall back to ast.literal_eval (Python literal)
+            images_dict = orjson.loads(images_str)
+        except orjson.JSONDecodeError:
+            # Older exports stored the column as a Python literal
             images_dict = ast.literal_eval(images_str)
-        
-        # Get posters array
-        posters = images_dict.get("posters", [])
-        if posters and isinstance(posters, list) and len(posters) > 0:
-            # Return the full_url from the first poster
-            poster_url = posters[0].get("full_url")
-            if poster_url:
-                print(f"DEBUG: Extracted poster URL: {poster_url}")
-                return poster_url
+
+        # Return the full_url from the first poster
+        posters = images_dict.get("posters")
+        if posters and isinstance(posters, list):
+            return posters[0].get("full_url") or None
     except Exception as e:
         print(f"DEBUG: Failed to parse images data: {e}")
         print(f"DEBUG: Images data was: {repr(images_data)}")
-    
+
     return None
 
 
+def _clean_text(col: pd.Series) -> pd.Series:
+    """Stripped strings with NaN/None (and their 'nan'/'None' spellings) as ''."""
+    return col.fillna("").astype(str).str.strip().replace({"nan": "", "None": ""})
+
+
+@lru_cache(maxsize=None)
+def _parse_genres(genres_raw) -> str:
+    # Extract genres from JSON-like string format
+    if isinstance(genres_raw, str) and genres_raw.startswith("["):
+        try:
+            genres_list = ast.literal_eval(genres_raw)
+            if isinstance(genres_list, list):
+                return ", ".join([g.get("name", "") for g in genres_list if isinstance(g, dict)])
+        except:
+            pass
+        return str(genres_raw)
+    return str(genres_raw) if genres_raw else ""
+
+
 def create_documents(df: pd.DataFrame):
-    docs = []
-    for idx, row in df.iterrows():
-        # Map new columns to expected format
-        # Use 'name' if 'title' is empty, otherwise use 'title'
-        title_raw = row.get("title", "") or row.get("name", "")
-        
-        # Handle NaN/None values and convert to string safely
-        if pd.isna(title_raw) or not title_raw or str(title_raw).strip() in ['nan', 'None', '']:
-            print(f"DEBUG: Skipping movie at index {idx} - no valid title (title_raw: {repr(title_raw)})")
-            continue  # Skip movies without valid titles
-            
-        title = str(title_raw).strip()
-        
-        # Extract genres from JSON-like string format
-        genres_raw = row.get("genres", "")
-        if isinstance(genres_raw, str) and genres_raw.startswith("["):
-            try:
-                # Parse JSON-like genres format
-                import ast
-                genres_list = ast.literal_eval(genres_raw)
-                if isinstance(genres_list, list):
-                    genres = ", ".join([g.get("name", "") for g in genres_list if isinstance(g, dict)])
-                else:
-                    genres = str(genres_raw)
-            except:
-                genres = str(genres_raw)
+    df = df.reindex(columns=DOCUMENT_COLUMNS, fill_value="")
+
+    # Use 'name' if 'title' is empty, otherwise use 'title'
+    titles = _clean_text(df["title"].where(df["title"] != "", df["name"]))
+    valid = titles != ""
+    skipped = int((~valid).sum())
+    if skipped:
+        print(f"DEBUG: Skipping {skipped} rows without a valid title")
+    df, titles = df[valid], titles[valid]
+
+    genres = df["genres"].fillna("").map(_parse_genres)
+    posters = [extract_poster_url(v) for v in df["images"]]
+    overviews = _clean_text(df["overview"])
+    taglines = _clean_text(df["tagline"])
+
+    # Text content for embedding: the non-empty parts, one per line
+    texts = [
+        " \n".join([p for p in parts if p])
+        for parts in zip(titles, overviews, _clean_text(genres), taglines)
+    ]
+    return [
+        Document(
+            page_content=text,
+            metadata={
+                "id": idx,  # Use row index as ID since there's no explicit ID column
+                "title": title,
+                "genres": genre,
+                "overview": overview,
+                "poster": poster,
+            },
+        )
+        for text, idx, title, genre, overview, poster
+        in zip(texts, df.index, titles, genres, overviews, posters)
+    ]
+
+
+async def _embed_texts_async(texts: List[str], paths: List[Path]) -> np.ndarray:
+    """Embed texts in concurrent batches, saving each batch to its cache paths as it arrives.
+
+    A batch that still fails after retries doesn't lose the others: every
+    batch that succeeded is already on disk, so a rerun resumes from there.
+    """
+    # One HTTP/2 connection pool multiplexes all concurrent batch requests
+    http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=EMBED_CONCURRENCY, max_keepalive_connections=EMBED_CONCURRENCY),
+        timeout=httpx.Timeout(120.0, connect=5.0),
+    )
+    client = AsyncOpenAI(max_retries=EMBED_MAX_RETRIES, http_client=http_client)
+    semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+    async def embed_batch(start: int) -> np.ndarray:
+        batch = texts[start:start + EMBED_BATCH_SIZE]
+        async with semaphore:
+            resp = await client.embeddings.create(model=EMBED_MODEL, input=batch)
+        vectors = np.array([item.embedding for item in sorted(resp.data, key=lambda d: d.index)], dtype=np.float32)
+        for path, vec in zip(paths[start:start + EMBED_BATCH_SIZE], vectors):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            np.save(path, vec)
+        return vectors
+
+    try:
+        results = await asyncio.gather(
+            *(embed_batch(start) for start in range(0, len(texts), EMBED_BATCH_SIZE)),
+            return_exceptions=True,
+        )
+    finally:
+        await client.close()
+        await http_client.aclose()
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        print(f"{len(errors)} of {len(results)} embedding batches failed; finished batches are cached")
+        raise errors[0]
+    return np.concatenate(results)
+
+
+def _embedding_cache_path(text: str) -> Path:
+    digest = hashlib.blake2b(f"{EMBED_MODEL}\0{text}".encode(), digest_size=16).hexdigest()
+    # Shard by prefix so no directory ends up with the whole catalogue
+    return EMBED_CACHE_DIR / digest[:2] / f"{digest}.npy"
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """Embed texts in concurrent batched requests, returned in input order.
+
+    Vectors are cached on disk by text hash; duplicate and previously seen
+    texts are not sent to the API.
+    """
+    paths = [_embedding_cache_path(t) for t in texts]
+    vectors = {}
+    missing = {}  # cache path -> text, one entry per distinct text
+    for text, path in zip(texts, paths):
+        if path in vectors or path in missing:
+            continue
+        if path.exists():
+            vectors[path] = np.load(path)
         else:
-            genres = str(genres_raw) if genres_raw else ""
-        
-        # Extract poster URL from images data
-        poster_url = extract_poster_url(row.get("images", ""))
-        
-        # Create text content for embedding - safely handle NaN values
-        def safe_str(value):
-            if pd.isna(value) or value is None:
-                return ""
-            str_val = str(value).strip()
-            return str_val if str_val not in ['nan', 'None'] else ""
-        
-        text_parts = [
-            safe_str(title),
-            safe_str(row.get("overview", "")),
-            safe_str(genres),
-            safe_str(row.get("tagline", "")),
-        ]
-        text = " \n".join([p for p in text_parts if p and p.strip()])
-        
-        # Create metadata
-        metadata = {
-            "id": idx,  # Use row index as ID since there's no explicit ID column
-            "title": title,
-            "genres": genres,
-            "overview": safe_str(row.get("overview", "")),
-            "poster": poster_url,  # Add poster URL to metadata
-        }
-        docs.append(Document(page_content=text, metadata=metadata))
-    return docs
+            missing[path] = text
+
+    print(f"{len(vectors)} embeddings cached, {len(missing)} to compute")
+    if missing:
+        computed = asyncio.run(_embed_texts_async(list(missing.values()), list(missing)))
+        vectors.update(zip(missing, computed))
+    return np.array([vectors[p] for p in paths], dtype=np.float32)
+
+
+def convert_index(flat: faiss.Index, factory: str = INDEX_FACTORY) -> faiss.Index:
+    """Return a `faiss.index_factory` index holding the same vectors as `flat`, in the same order."""
+    vectors = flat.reconstruct_n(0, flat.ntotal)
+    index = faiss.index_factory(flat.d, factory, flat.metric_type)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def rebuild_index(vectorstore: FAISS, factory: str = INDEX_FACTORY) -> None:
+    """Replace the default float32 flat index with a `faiss.index_factory` index."""
+    vectorstore.index = convert_index(vectorstore.index, factory)
+
+
+def reindex() -> None:
+    """Convert the saved index to INDEX_FACTORY in place, reusing its stored vectors (no API calls).
+
+    Row order is kept, so the docstore mapping in index.pkl stays valid.
+    """
+    path = str(INDEX_DIR / "index.faiss")
+    index = convert_index(faiss.read_index(path))
+    faiss.write_index(index, path)
+    print(f"Rebuilt {index.ntotal} vectors in {INDEX_DIR} as {INDEX_FACTORY}")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Embed the catalogue and build the FAISS index.")
+    parser.add_argument("--reindex", action="store_true",
+                        help="only rebuild the saved index as INDEX_FACTORY from its stored vectors")
+    if parser.parse_args().reindex:
+        reindex()
+        return
+
     INDEX_DIR.mkdir(parents=True, exist_ok=True)
 
     df = load_movies()
@@ -125,7 +242,14 @@ def main():
 
     embeddings = OpenAIEmbeddings(model=EMBED_MODEL)
     print(f"Computing embeddings for {len(docs)} documents ...")
-    vectorstore = FAISS.from_documents(docs, embedding=embeddings)
+    texts = [d.page_content for d in docs]
+    vectors = embed_texts(texts)
+    vectorstore = FAISS.from_embeddings(
+        zip(texts, vectors.tolist()),
+        embedding=embeddings,
+        metadatas=[d.metadata for d in docs],
+    )
+    rebuild_index(vectorstore)
     vectorstore.save_local(str(INDEX_DIR))
 
     # Save metadata for quick lookup
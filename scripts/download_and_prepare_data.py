@@ -25,16 +25,16 @@ def prepare_movies_df(zip_bytes: bytes) -> pd.DataFrame:
         with zf.open("ml-latest-small/movies.csv") as f:
             df = pd.read_csv(f)
 
-    # Clean title (remove year if present)
-    df["title"] = df["title"].str.replace(r" \(\d{4}\)$", "", regex=True)
+    # Clean title (remove year if present): check only the last 7 characters
+    # and slice, rather than running a regex substitution over every title
+    has_year = df["title"].str[-7:].str.fullmatch(r" \(\d{4}\)", na=False)
+    df["title"] = df["title"].where(~has_year, df["title"].str[:-7])
 
     # Handle genres
     df["genres"] = df["genres"].replace("(no genres listed)", "").fillna("")
 
     # Synthesize overview if missing
-    df["overview"] = df.apply(
-        lambda row: f"A {row['genres'].replace('|', ', ')} movie titled {row['title']}.", axis=1
-    )
+    df["overview"] = "A " + df["genres"].str.replace("|", ", ", regex=False) + " movie titled " + df["title"] + "."
 
     # Additional empty columns for future enrichment
     df["cast"] = ""
@@ -8,11 +8,17 @@ Handles complex nested JSON data and provides readable output.
 Usage:
     python streaming_catalog_parser.py --file data/hulu_disneyplus_us.csv --limit 5
     python streaming_catalog_parser.py --file data/hulu_disneyplus_us.csv --id 1243341
+    python streaming_catalog_parser.py --file data/hulu_disneyplus_us.csv --stats --limit 0 --columns service,media_type,genres
 """
 
+import io
 import json
+import sys
 import argparse
+import orjson
 import pandas as pd
+from collections import Counter
+from contextlib import redirect_stdout
 from typing import Dict, Any, List, Optional
 from pathlib import Path
 
@@ -20,9 +26,18 @@ from pathlib import Path
 class StreamingCatalogParser:
     """Parser for streaming service catalog CSV files."""
     
-    def __init__(self, csv_file: str):
-        """Initialize parser with CSV file path."""
+    # Columns holding JSON strings
+    _JSON_FIELDS = frozenset({
+        'genres', 'credits', 'watch_providers', 'external_ids', 'keywords', 'videos',
+        'images', 'translations', 'release_dates', 'content_ratings'
+    })
+    # Columns get_catalog_stats reads
+    STATS_COLUMNS = ('service', 'media_type', 'genres')
+    
+    def __init__(self, csv_file: str, columns: Optional[List[str]] = None):
+        """Initialize parser with CSV file path (optionally loading only some columns)."""
         self.csv_file = Path(csv_file)
+        self.columns = columns
         self.df = None
         self.load_data()
     
@@ -32,43 +47,61 @@ class StreamingCatalogParser:
             raise FileNotFoundError(f"CSV file not found: {self.csv_file}")
         
         print(f"📖 Loading catalog data from {self.csv_file}...")
-        self.df = pd.read_csv(self.csv_file)
+        # The wide JSON columns dominate parse time, so skip any the caller doesn't need
+        self.df = pd.read_csv(self.csv_file, usecols=self.columns)
+        # JSON columns stay as strings; only the rows actually displayed are
+        # decoded (see _decode_entry), and stats decode each distinct genre list once
+        # tmdb_id -> row position of its first entry, for O(1) lookups
+        self._id_index = {}
+        if 'tmdb_id' in self.df.columns:
+            ids = self.df['tmdb_id'].tolist()
+            # Assigning in reverse leaves each id pointing at its first row
+            self._id_index = dict(zip(reversed(ids), range(len(ids) - 1, -1, -1)))
         print(f"✅ Loaded {len(self.df)} entries")
     
     def get_entry_by_id(self, tmdb_id: int) -> Optional[Dict[str, Any]]:
         """Get a specific entry by TMDB ID."""
-        entry = self.df[self.df['tmdb_id'] == tmdb_id]
-        if entry.empty:
+        idx = self._id_index.get(tmdb_id)
+        if idx is None:
             return None
-        return entry.iloc[0].to_dict()
+        return self._decode_entry(self.df.iloc[idx].to_dict())
     
     def get_sample_entries(self, limit: int = 5) -> List[Dict[str, Any]]:
         """Get sample entries from the catalog."""
-        return self.df.head(limit).to_dict('records')
+        return [self._decode_entry(entry) for entry in self.df.head(limit).to_dict('records')]
+    
+    def _decode_entry(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Decode the JSON columns of one row."""
+        for field in self._JSON_FIELDS.intersection(entry):
+            entry[field] = _decode_json(entry[field])
+        return entry
     
     def parse_json_field(self, field_value: str) -> Any:
         """Safely parse JSON field values."""
-        if pd.isna(field_value) or field_value == '':
+        if isinstance(field_value, (dict, list)):
+            # Already decoded by load_data
+            parsed = field_value
+        elif pd.isna(field_value) or field_value == '':
             return None
-        try:
-            parsed = json.loads(field_value)
-            # Remove "results:" prefix if it exists in the string
-            if isinstance(parsed, dict) and 'results' in parsed:
-                return parsed['results']
-            return parsed
-        except (json.JSONDecodeError, TypeError):
-            return field_value
+        else:
+            try:
+                parsed = json.loads(field_value)
+            except (json.JSONDecodeError, TypeError):
+                return field_value
+        # Remove "results:" prefix if it exists in the string
+        if isinstance(parsed, dict) and 'results' in parsed:
+            return parsed['results']
+        return parsed
     
     def format_field_value(self, field_name: str, value: Any, max_length: int = 200) -> str:
         """Format field value for display."""
+        if isinstance(value, (dict, list)):
+            return f"[JSON Data - {len(str(value))} chars]"
         if pd.isna(value) or value is None:
             return "None"
         
         # Handle JSON fields
-        if isinstance(value, str) and (field_name in ['genres', 'credits', 'watch_providers', 
-                                                     'external_ids', 'keywords', 'videos', 
-                                                     'images', 'translations', 'release_dates', 
-                                                     'content_ratings'] or value.startswith('{')):
+        if isinstance(value, str) and (field_name in self._JSON_FIELDS or value[:1] == '{'):
             parsed = self.parse_json_field(value)
             if isinstance(parsed, (dict, list)):
                 return f"[JSON Data - {len(str(parsed))} chars]"
@@ -81,6 +114,13 @@ class StreamingCatalogParser:
     
     def display_entry(self, entry: Dict[str, Any], show_json_details: bool = False):
         """Display a single catalog entry in a formatted way."""
+        # Collect the dozens of print() lines and write them to stdout at once
+        buf = io.StringIO()
+        with redirect_stdout(buf):
+            self._print_entry(entry, show_json_details)
+        sys.stdout.write(buf.getvalue())
+    
+    def _print_entry(self, entry: Dict[str, Any], show_json_details: bool = False):
         print("\n" + "="*80)
         print(f"🎬 {entry.get('title', entry.get('name', 'Unknown Title'))}")
         print("="*80)
@@ -176,9 +216,12 @@ class StreamingCatalogParser:
         print("="*80)
         
         entries = self.get_sample_entries(limit)
-        for i, entry in enumerate(entries, 1):
-            print(f"\n📺 ENTRY #{i}")
-            self.display_entry(entry, show_json_details)
+        buf = io.StringIO()
+        with redirect_stdout(buf):
+            for i, entry in enumerate(entries, 1):
+                print(f"\n📺 ENTRY #{i}")
+                self._print_entry(entry, show_json_details)
+        sys.stdout.write(buf.getvalue())
     
     def display_entry_by_id(self, tmdb_id: int, show_json_details: bool = False):
         """Display a specific entry by TMDB ID."""
@@ -214,41 +257,60 @@ class StreamingCatalogParser:
         # Top genres (if available)
         if 'genres' in self.df.columns:
             print("\nTop genres (first 10):")
-            all_genres = []
-            for genres_str in self.df['genres'].dropna():
-                try:
-                    genres = json.loads(genres_str)
-                    if isinstance(genres, list):
-                        all_genres.extend([g.get('name', 'Unknown') for g in genres])
-                except:
-                    continue
+            # Most titles share a few genre lists: decode each distinct string
+            # once, in first-seen order, and weight it by its row count
+            genre_counts = Counter()
+            for raw, count in self.df['genres'].value_counts(sort=False).items():
+                genres = _decode_json(raw)
+                if isinstance(genres, list):
+                    for g in genres:
+                        if isinstance(g, dict):
+                            genre_counts[g.get('name', 'Unknown')] += count
             
-            if all_genres:
-                from collections import Counter
-                genre_counts = Counter(all_genres)
-                for genre, count in genre_counts.most_common(10):
-                    print(f"  {genre}: {count} entries")
+            for genre, count in genre_counts.most_common(10):
+                print(f"  {genre}: {count} entries")
+
+
+def _decode_json(value: Any) -> Any:
+    """Decode a non-empty JSON string; anything else (or invalid JSON) is returned unchanged."""
+    if not isinstance(value, str) or not value:
+        return value
+    try:
+        return orjson.loads(value)
+    except orjson.JSONDecodeError:
+        return value
 
 
 def main():
     parser = argparse.ArgumentParser(description="Parse streaming catalog CSV files")
     parser.add_argument("--file", required=True, help="Path to CSV file")
-    parser.add_argument("--limit", type=int, default=3, help="Number of sample entries to display")
+    parser.add_argument("--limit", type=int, default=3, help="Number of sample entries to display (0 for none)")
     parser.add_argument("--id", type=int, help="Display specific entry by TMDB ID")
     parser.add_argument("--stats", action="store_true", help="Show catalog statistics")
     parser.add_argument("--json-details", action="store_true", help="Show detailed JSON content")
+    parser.add_argument("--columns", help="Comma-separated columns to load (default: all); "
+                                          "columns needed by --stats / --id are added automatically")
     
     args = parser.parse_args()
     
+    columns = None
+    if args.columns:
+        columns = [c.strip() for c in args.columns.split(',') if c.strip()]
+        if args.stats:
+            columns += StreamingCatalogParser.STATS_COLUMNS
+        if args.id:
+            columns.append('tmdb_id')
+        columns = list(dict.fromkeys(columns))
+    
     try:
-        catalog_parser = StreamingCatalogParser(args.file)
+        catalog_parser = StreamingCatalogParser(args.file, columns)
         
         if args.stats:
             catalog_parser.get_catalog_stats()
         
         if args.id:
             catalog_parser.display_entry_by_id(args.id, args.json_details)
-        else:
+        elif args.limit > 0:
             catalog_parser.display_sample_entries(args.limit, args.json_details)
             
     except Exception as e:
@@ -12,11 +12,21 @@ This script:
 
 import os
 import json
+import multiprocessing as mp
+import orjson
 import pandas as pd
 from typing import Dict, Any, List
 
 # TMDB image base URL
 TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p/original"
+# Columns dropped from the cleaned catalog
+COLUMNS_TO_REMOVE = {
+    'status', 'spoken_languages', 'production_companies', 'production_countries', 
+    'languages', 'watch_providers', 'credits', 'videos', 'translations', 'release_dates',
+    'external_ids', 'homepage', 'in_production'
+}
+# Rows handed to each worker process at a time when cleaning in parallel
+CLEAN_CHUNK_SIZE = 500
 
 def clean_images_data(images_json: str, tmdb_id: int = None) -> Dict[str, Any]:
     """
@@ -32,8 +42,8 @@ def clean_images_data(images_json: str, tmdb_id: int = None) -> Dict[str, Any]:
         return {}
     
     try:
-        images_data = json.loads(images_json)
-    except (json.JSONDecodeError, TypeError):
+        images_data = orjson.loads(images_json)
+    except (orjson.JSONDecodeError, TypeError):
         return {}
     
     cleaned_images = {}
@@ -51,11 +61,8 @@ def clean_images_data(images_json: str, tmdb_id: int = None) -> Dict[str, Any]:
                 poster.get('iso_639_1') is None):  # Some posters don't have language specified
                 english_posters.append(poster)
         
-        # Sort by vote_average (popularity) in descending order
-        english_posters.sort(key=lambda x: x.get('vote_average', 0), reverse=True)
-        
-        # Take top 1
-        top_1_poster = english_posters[:1]
+        # Take the top 1 by vote_average (popularity); no need to sort them all
+        top_1_poster = english_posters and [max(english_posters, key=lambda x: x.get('vote_average', 0))]
         
         # Add full URLs and tmdb_id to each poster, remove file_path
         for poster in top_1_poster:
@@ -68,6 +75,12 @@ def clean_images_data(images_json: str, tmdb_id: int = None) -> Dict[str, Any]:
     
     return cleaned_images
 
+def _clean_images_row(row) -> tuple:
+    """Worker for clean_catalog_file: (images_json, tmdb_id) -> (cleaned JSON, poster count)."""
+    images_json, tmdb_id = row
+    cleaned_img = clean_images_data(images_json, tmdb_id)
+    return json.dumps(cleaned_img, ensure_ascii=False), len(cleaned_img.get('posters', []))
+
 def clean_catalog_file(input_file: str, output_file: str):
     """
     Clean the entire catalog file by processing all rows.
@@ -77,30 +90,25 @@ def clean_catalog_file(input_file: str, output_file: str):
         output_file: Path to output CSV file
     """
     print(f"📖 Loading catalog from {input_file}...")
-    df = pd.read_csv(input_file)
-    
-    # Remove specified columns
-    columns_to_remove = [
-        'status', 'spoken_languages', 'production_companies', 'production_countries', 
-        'languages', 'watch_providers', 'credits', 'videos', 'translations', 'release_dates',
-        'external_ids', 'homepage', 'in_production'
-    ]
-    
-    for col in columns_to_remove:
-        if col in df.columns:
-            df = df.drop(columns=[col])
+    # Skip the removed columns at parse time; credits, videos and translations
+    # are the bulk of the file and would only be dropped again
+    for col in pd.read_csv(input_file, nrows=0).columns:
+        if col in COLUMNS_TO_REMOVE:
             print(f"🗑️  Removed column: {col}")
+    df = pd.read_csv(input_file, usecols=lambda col: col not in COLUMNS_TO_REMOVE)
     
     print(f"🧹 Cleaning images for {len(df)} entries...")
     
-    # Process images column
+    # Process images column; rows are independent, so spread them over all cores
     cleaned_images = []
-    for idx, row in df.iterrows():
-        if idx % 1000 == 0:
-            print(f"   Processed {idx}/{len(df)} entries...")
-        
-        cleaned_img = clean_images_data(row['images'], row['tmdb_id'])
-        cleaned_images.append(json.dumps(cleaned_img, ensure_ascii=False))
+    total_posters = 0
+    with mp.Pool() as pool:
+        rows = zip(df['images'], df['tmdb_id'])
+        for idx, (cleaned_json, n_posters) in enumerate(pool.imap(_clean_images_row, rows, chunksize=CLEAN_CHUNK_SIZE)):
+            if idx % 1000 == 0:
+                print(f"   Processed {idx}/{len(df)} entries...")
+            total_posters += n_posters
+            cleaned_images.append(cleaned_json)
     
     # Replace the images column
     df['images'] = cleaned_images
@@ -111,15 +119,6 @@ def clean_catalog_file(input_file: str, output_file: str):
     print(f"✅ Cleaned catalog saved! {len(df)} entries processed.")
     
     # Print some statistics
-    total_posters = 0
-    for img_json in cleaned_images:
-        try:
-            img_data = json.loads(img_json)
-            if 'posters' in img_data:
-                total_posters += len(img_data['posters'])
-        except:
-            pass
-    
     print(f"📊 Statistics:")
     print(f"   - Total entries: {len(df)}")
     print(f"   - Total posters kept: {total_posters}")
@@ -18,12 +18,49 @@ import json
 import pandas as pd
 from typing import Dict, Any, List
 
+# Rows parsed at a time while scanning the catalog for examples
+READ_CHUNK_SIZE = 1000
+
+# Columns decoded from JSON strings / coerced to numbers in the output
+JSON_FIELDS = frozenset({'genres', 'keywords', 'images', 'content_ratings'})
+INT_FIELDS = frozenset({'tmdb_id', 'vote_count', 'budget', 'revenue', 'number_of_seasons', 'number_of_episodes'})
+FLOAT_FIELDS = frozenset({'runtime', 'episode_run_time', 'popularity', 'vote_average'})
+
+def _json_or_value(value):
+    try:
+        return json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return value
+
+def _int_or_value(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return value
+
+def _float_or_value(value):
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return value
+
+# Column -> converter for non-null values; other columns pass through as-is
+CONVERTERS = {
+    **{column: _json_or_value for column in JSON_FIELDS},
+    **{column: _int_or_value for column in INT_FIELDS},
+    **{column: _float_or_value for column in FLOAT_FIELDS},
+}
+
+def _is_null(value) -> bool:
+    # read_csv marks missing cells as float NaN (NaN != NaN); cheaper than pd.isna per cell
+    return value is None or (isinstance(value, float) and value != value)
+
 def convert_entry_to_json(entry) -> Dict[str, Any]:
     """
-    Convert a pandas Series entry to JSON format.
+    Convert a catalog entry to JSON format.
     
     Args:
-        entry: Pandas Series containing the entry data
+        entry: Mapping of column name to value (a dict or pandas Series)
         
     Returns:
         Dictionary with properly formatted JSON data
@@ -31,36 +68,14 @@ def convert_entry_to_json(entry) -> Dict[str, Any]:
     sample_data = {}
     
     # Process each column
-    for column in entry.index:
-        value = entry[column]
-        
+    for column, value in entry.items():
         # Handle NaN values
-        if pd.isna(value):
+        if _is_null(value):
             sample_data[column] = None
             continue
         
-        # Handle JSON fields
-        json_fields = ['genres', 'keywords', 'images', 'content_ratings']
-        
-        if column in json_fields and value != '':
-            try:
-                sample_data[column] = json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                sample_data[column] = value
-        else:
-            # Handle numeric fields
-            if column in ['tmdb_id', 'vote_count', 'budget', 'revenue', 'number_of_seasons', 'number_of_episodes']:
-                try:
-                    sample_data[column] = int(value) if pd.notna(value) else None
-                except (ValueError, TypeError):
-                    sample_data[column] = value
-            elif column in ['runtime', 'episode_run_time', 'popularity', 'vote_average']:
-                try:
-                    sample_data[column] = float(value) if pd.notna(value) else None
-                except (ValueError, TypeError):
-                    sample_data[column] = value
-            else:
-                sample_data[column] = value
+        convert = CONVERTERS.get(column)
+        sample_data[column] = convert(value) if convert is not None else value
     
     return sample_data
 
@@ -79,9 +94,6 @@ def find_four_examples(input_file: str, output_file: str):
         print(f"❌ Input file not found: {input_file}")
         return
     
-    # Load the CSV file
-    df = pd.read_csv(input_file)
-    
     print(f"🔍 Finding examples for each service/media_type combination...")
     
     # Define the combinations we want to find
@@ -92,15 +104,29 @@ def find_four_examples(input_file: str, output_file: str):
         ('Hulu', 'tv')
     ]
     
+    # Read the CSV in chunks and stop once every combination has an example,
+    # rather than parsing the whole catalog for four rows
+    first_entries = {}
+    with pd.read_csv(input_file, chunksize=READ_CHUNK_SIZE) as reader:
+        for chunk in reader:
+            # One pass over the chunk keeps the first row of every service/media_type pair
+            first_rows = chunk.drop_duplicates(['service', 'media_type'])
+            columns = first_rows.columns.tolist()
+            # Plain dicts from tuples, rather than a boxed Series per row
+            for row in first_rows.itertuples(index=False, name=None):
+                entry = dict(zip(columns, row))
+                key = (entry['service'], entry['media_type'])
+                if key in combinations and key not in first_entries:
+                    first_entries[key] = entry
+            if len(first_entries) == len(combinations):
+                break
+    
     examples = {}
     
     for service, media_type in combinations:
-        # Filter for the specific combination
-        filtered_df = df[(df['service'] == service) & (df['media_type'] == media_type)]
+        example_entry = first_entries.get((service, media_type))
         
-        if len(filtered_df) > 0:
-            # Take the first example
-            example_entry = filtered_df.iloc[0]
+        if example_entry is not None:
             example_data = convert_entry_to_json(example_entry)
             
             key = f"{service}_{media_type}"
@@ -6,18 +6,20 @@ Usage:
     python get_tmdb_catalog.py --out catalog.csv
 
 Requirements:
-    pip install requests pandas tqdm tenacity pyyaml
+    pip install requests pandas tqdm pyyaml
 """
 
 import os
-import json
 import time
 import argparse
-from typing import Dict, Any, Iterable, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import orjson
 import requests
 import pandas as pd
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
-from tenacity import retry, stop_after_attempt, wait_fixed
+from urllib3.util.retry import Retry
 
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 BASE = "https://api.themoviedb.org/3"
@@ -42,31 +44,31 @@ APPEND_TO_RESPONSE = ",".join([
 
 # --- HTTP Helpers ------------------------------------------------------------
 
-@retry(stop=stop_after_attempt(5), wait=wait_fixed(2))
+# One pooled session keeps TLS connections to TMDB alive across calls (and
+# across the detail-fetch threads). urllib3 retries connection errors, 429s
+# (honouring Retry-After) and 5xx with exponential backoff.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
 def tmdb_get(path: str, **params) -> Dict[str, Any]:
     """GET wrapper with retry/backoff."""
     if TMDB_API_KEY is None:
         raise RuntimeError("TMDB_API_KEY not set in env vars.")
     params["api_key"] = TMDB_API_KEY
-    r = requests.get(f"{BASE}{path}", params=params, timeout=30)
-    if r.status_code == 429:
-        # Rate limited—sleep a bit and retry
-        reset = int(r.headers.get("Retry-After", 2))
-        time.sleep(reset)
-        raise RuntimeError("Rate limited, retrying...")
+    r = _SESSION.get(f"{BASE}{path}", params=params, timeout=30)
     r.raise_for_status()
-    return r.json()
+    return orjson.loads(r.content)
 
-def discover_ids(media_type: str, provider_id: int, region: str = "US") -> List[int]:
+def discover_ids(media_type: str, provider_id: int, region: str = "US", workers: int = 8) -> List[int]:
     """
     Page through /discover/{movie|tv} to get all TMDB IDs for a provider in a region.
     """
-    ids = []
-    page = 1
-    total_pages = None
-    pbar = tqdm(desc=f"Discover {media_type} ({provider_id})", unit="page")
-    while True:
-        data = tmdb_get(
+    def get_page(page: int) -> Dict[str, Any]:
+        return tmdb_get(
             f"/discover/{media_type}",
             with_watch_providers=str(provider_id),
             watch_region=region,
@@ -75,19 +77,21 @@ def discover_ids(media_type: str, provider_id: int, region: str = "US") -> List[
             sort_by="popularity.desc",
             page=page,
         )
-        if total_pages is None:
-            total_pages = data.get("total_pages", 1)
-            pbar.total = total_pages
-        results = data.get("results", [])
-        ids.extend([item["id"] for item in results])
-        pbar.update(1)
-        if page >= total_pages:
-            break
-        page += 1
-        # gentle throttle to avoid 429
-        time.sleep(0.2)
+
+    # Page 1 tells us total_pages; the rest are fetched concurrently (429s are
+    # retried by the session, so no fixed throttle is needed)
+    first = get_page(1)
+    total_pages = first.get("total_pages", 1)
+    pbar = tqdm(desc=f"Discover {media_type} ({provider_id})", unit="page", total=total_pages)
+    pbar.update(1)
+    pages = [first]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # map() keeps page order, so ids stay in popularity order
+        for data in pool.map(get_page, range(2, total_pages + 1)):
+            pages.append(data)
+            pbar.update(1)
     pbar.close()
-    return ids
+    return [item["id"] for data in pages for item in data.get("results", [])]
 
 def chunked(iterable: Iterable[Any], size: int) -> Iterable[List[Any]]:
     """Yield lists of length 'size' from iterable."""
@@ -112,6 +116,56 @@ def fetch_details(media_type: str, tmdb_id: int) -> Dict[str, Any]:
     detail["_media_type"] = media_type
     return detail
 
+def _dumps(value: Any) -> str:
+    # orjson writes UTF-8 directly, like json.dumps(..., ensure_ascii=False)
+    return orjson.dumps(value).decode()
+
+# Simple scalar fields
+SCALAR_KEYS = (
+    "title",
+    "name",
+    "original_title",
+    "original_name",
+    "overview",
+    "tagline",
+    "status",
+    "release_date",
+    "first_air_date",
+    "last_air_date",
+    "runtime",
+    "episode_run_time",
+    "number_of_seasons",
+    "number_of_episodes",
+    "in_production",
+    "original_language",
+    "homepage",
+    "popularity",
+    "vote_average",
+    "vote_count",
+    "budget",
+    "revenue",
+)
+
+# Genres, spoken languages, production companies, countries (lists)
+JSON_LIST_KEYS = (
+    "genres",
+    "spoken_languages",
+    "production_companies",
+    "production_countries",
+    "origin_country",
+    "languages",
+)
+
+# Credits, videos, images, translations, ratings (dicts)
+JSON_DICT_KEYS = (
+    "credits",
+    "videos",
+    "images",
+    "translations",
+    "release_dates",
+    "content_ratings",
+)
+
 def flatten_record(
     d: Dict[str, Any],
     service: str,
@@ -121,77 +175,35 @@ def flatten_record(
     - Keep most scalar fields
     - Dump lists/dicts as JSON strings
     """
-    row = {
+    # Keywords: TV sends {"results": [...]} ; Movie sends {"keywords": [...]}
+    kw = d.get("keywords", {})
+    kw_list = kw.get("results") if "results" in kw else kw.get("keywords")
+
+    # Built as one literal, in the CSV's column order
+    return {
         "service": service,
         "media_type": d.get("_media_type"),
         "tmdb_id": d.get("id"),
+        **{k: d.get(k) for k in SCALAR_KEYS},
+        **{k: _dumps(d.get(k, [])) for k in JSON_LIST_KEYS},
+        # External IDs (imdb_id, tvdb_id, etc.)
+        "external_ids": _dumps(d.get("external_ids", {})),
+        "keywords": _dumps(kw_list if kw_list is not None else kw),
+        # Watch providers (all regions)
+        "watch_providers": _dumps(d.get("watch/providers", {})),
+        **{k: _dumps(d.get(k, {})) for k in JSON_DICT_KEYS},
     }
 
-    # Simple scalar fields
-    scalar_keys = [
-        "title",
-        "name",
-        "original_title",
-        "original_name",
-        "overview",
-        "tagline",
-        "status",
-        "release_date",
-        "first_air_date",
-        "last_air_date",
-        "runtime",
-        "episode_run_time",
-        "number_of_seasons",
-        "number_of_episodes",
-        "in_production",
-        "original_language",
-        "homepage",
-        "popularity",
-        "vote_average",
-        "vote_count",
-        "budget",
-        "revenue",
-    ]
-    for k in scalar_keys:
-        row[k] = d.get(k)
-
-    # Genres as list
-    row["genres"] = json.dumps(d.get("genres", []), ensure_ascii=False)
-
-    # Spoken languages, production companies, countries
-    for k in [
-        "spoken_languages",
-        "production_companies",
-        "production_countries",
-        "origin_country",
-        "languages",
-    ]:
-        row[k] = json.dumps(d.get(k, []), ensure_ascii=False)
-
-    # External IDs (imdb_id, tvdb_id, etc.)
-    row["external_ids"] = json.dumps(d.get("external_ids", {}), ensure_ascii=False)
-
-    # Keywords
-    kw = d.get("keywords", {})
-    # TV sends {"results": [...]} ; Movie sends {"keywords": [...]}
-    kw_list = kw.get("results") if "results" in kw else kw.get("keywords")
-    row["keywords"] = json.dumps(kw_list if kw_list is not None else kw, ensure_ascii=False)
-
-    # Watch providers (all regions)
-    row["watch_providers"] = json.dumps(d.get("watch/providers", {}), ensure_ascii=False)
-
-    # Credits
-    row["credits"] = json.dumps(d.get("credits", {}), ensure_ascii=False)
-
-    # Videos, images, translations
-    for k in ["videos", "images", "translations"]:
-        row[k] = json.dumps(d.get(k, {}), ensure_ascii=False)
-
-    # Ratings
-    row["release_dates"] = json.dumps(d.get("release_dates", {}), ensure_ascii=False)
-    row["content_ratings"] = json.dumps(d.get("content_ratings", {}), ensure_ascii=False)
-
-    return row
+def fetch_title(media_type: str, sleep: float, tmdb_id: int) -> Optional[Dict[str, Any]]:
+    """Fetch one title's details; None (after logging) if the request fails."""
+    try:
+        return fetch_details(media_type, tmdb_id)
+    except Exception as e:
+        print(f"Error on {media_type} {tmdb_id}: {e}")
+        return None
+    finally:
+        if sleep:
+            time.sleep(sleep)
 
 # --- Main --------------------------------------------------------------------
 
@@ -199,7 +211,8 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--out", default="hulu_disneyplus_us.csv", help="CSV output path")
     parser.add_argument("--region", default="US")
-    parser.add_argument("--sleep", type=float, default=0.15, help="sleep between detail calls")
+    parser.add_argument("--workers", type=int, default=16, help="concurrent detail requests")
+    parser.add_argument("--sleep", type=float, default=0.0, help="per-worker sleep after each detail call")
     parser.add_argument("--chunk", type=int, default=50, help="flush to CSV every N records")
     args = parser.parse_args()
 
@@ -209,26 +222,37 @@ def main():
     rows = []
     total_written = 0
 
+    # Discover everything up front so a title carried by both services (or
+    # repeated across discover pages) has its details fetched only once
+    services_by_title: Dict[Tuple[str, int], List[str]] = {}
     for service, provider_id in PROVIDERS.items():
         for media_type in ["movie", "tv"]:
-            ids = discover_ids(media_type, provider_id, args.region)
-            for tmdb_id in tqdm(ids, desc=f"Fetch {media_type} details for {service}", unit="title"):
-                try:
-                    detail = fetch_details(media_type, tmdb_id)
-                    row = flatten_record(detail, service)
-                    rows.append(row)
-                except Exception as e:
-                    print(f"Error on {media_type} {tmdb_id}: {e}")
-                time.sleep(args.sleep)
-
-                # Periodically flush to disk
-                if len(rows) >= args.chunk:
-                    df = pd.DataFrame(rows)
-                    mode = "a" if total_written > 0 else "w"
-                    header = total_written == 0
-                    df.to_csv(args.out, index=False, mode=mode, header=header)
-                    total_written += len(rows)
-                    rows.clear()
+            for tmdb_id in discover_ids(media_type, provider_id, args.region):
+                services = services_by_title.setdefault((media_type, tmdb_id), [])
+                if service not in services:
+                    services.append(service)
+    titles = list(services_by_title)
+
+    # Detail calls only wait on the network, so run them in a thread pool;
+    # 429s are still retried by the session after the Retry-After delay
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        details = pool.map(lambda title: fetch_title(title[0], args.sleep, title[1]), titles)
+        # map() yields in input order, so the CSV keeps discover order
+        for title, detail in tqdm(zip(titles, details), total=len(titles),
+                                  desc="Fetch details", unit="title"):
+            if detail is not None:
+                # One row per service carrying the title, as before
+                for service in services_by_title[title]:
+                    rows.append(flatten_record(detail, service))
+
+            # Periodically flush to disk
+            if len(rows) >= args.chunk:
+                df = pd.DataFrame(rows)
+                mode = "a" if total_written > 0 else "w"
+                header = total_written == 0
+                df.to_csv(args.out, index=False, mode=mode, header=header)
+                total_written += len(rows)
+                rows.clear()
 
     # Final flush
     if rows:
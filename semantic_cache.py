@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def filter_signature(filters: Optional[Mapping[str, str]]) -> str:
+    """Canonical string for a request's structured filters (mood, age, genre, ...).
+
+    Empty values are dropped and names are sorted, so the same filters always
+    give the same signature; no filters gives "".
+    """
+    if not filters:
+        return ""
+    return "|".join(f"{name}={str(value).strip().casefold()}"
+                    for name, value in sorted(filters.items()) if str(value).strip())
+
+
+class SemanticCache:
+    """Bounded LRU cache of recommendations keyed by query embedding.
+
+    A lookup hits when a cached query with the same `k` and filter `signature`
+    has cosine similarity >= `threshold` to the new query. The signature must
+    match exactly: a different mood or genre can change the answer without
+    moving the embedding much. Vectors are L2-normalised on insert so the
+    whole probe is one matrix-vector product over at most `max_size` rows.
+    Entries stored with their query text can also be found by `get_exact`,
+    which needs no embedding at all.
+    """
+
+    def __init__(self, threshold: float = 0.97, max_size: int = 512):
+        self.threshold = threshold
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._vecs: Optional[np.ndarray] = None  # (max_size, dim), allocated on first insert
+        self._ks = np.full(max_size, -1, dtype=np.int64)  # -1 marks a free slot
+        self._sig_ids = np.full(max_size, -1, dtype=np.int64)  # per slot, into _sigs
+        self._lru: "OrderedDict[int, List[Dict]]" = OrderedDict()  # slot -> recs, oldest first
+        self._exact: Dict[Tuple[str, int, str], int] = {}  # (query, k, signature) -> slot
+        self._slot_keys: Dict[int, Tuple[str, int, str]] = {}  # slot -> exact key, for eviction
+        # Signatures are interned to ints so matching stays vectorised; an id
+        # is released when the last slot using it is overwritten
+        self._sigs: Dict[str, int] = {}  # signature -> id
+        self._sig_refs: Dict[int, Tuple[str, int]] = {}  # id -> (signature, live slots)
+        self._next_sig_id = 0
+
+    @staticmethod
+    def _normalize(vec: Sequence[float]) -> np.ndarray:
+        q = np.asarray(vec, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        return q / norm if norm else q
+
+    def get_exact(self, query: str, k: int, signature: str = "") -> Optional[List[Dict]]:
+        with self._lock:
+            slot = self._exact.get((query.strip(), k, signature))
+            if slot is None:
+                return None
+            self._lru.move_to_end(slot)
+            return self._lru[slot]
+
+    def get(self, vec: Sequence[float], k: int, signature: str = "") -> Optional[List[Dict]]:
+        q = self._normalize(vec)
+        with self._lock:
+            sig_id = self._sigs.get(signature)
+            if self._vecs is None or sig_id is None:
+                return None
+            # Slots fill in order, so only the first len(_lru) rows are live
+            n = len(self._lru)
+            sims = self._vecs[:n] @ q
+            sims[(self._ks[:n] != k) | (self._sig_ids[:n] != sig_id)] = -np.inf
+            slot = int(np.argmax(sims))
+            if sims[slot] < self.threshold:
+                return None
+            self._lru.move_to_end(slot)
+            return self._lru[slot]
+
+    def put(self, vec: Sequence[float], k: int, recs: List[Dict], query: Optional[str] = None,
+            signature: str = ""):
+        q = self._normalize(vec)
+        with self._lock:
+            if self._vecs is None:
+                self._vecs = np.zeros((self.max_size, q.shape[0]), dtype=np.float32)
+            if len(self._lru) < self.max_size:
+                slot = len(self._lru)
+            else:
+                slot, _ = self._lru.popitem(last=False)
+                old_key = self._slot_keys.pop(slot, None)
+                if old_key is not None and self._exact.get(old_key) == slot:
+                    del self._exact[old_key]
+                self._release_signature(int(self._sig_ids[slot]))
+            self._vecs[slot] = q
+            self._ks[slot] = k
+            self._sig_ids[slot] = self._acquire_signature(signature)
+            self._lru[slot] = recs
+            if query is not None:
+                key = (query.strip(), k, signature)
+                self._exact[key] = slot
+                self._slot_keys[slot] = key
+
+    def _acquire_signature(self, signature: str) -> int:
+        sig_id = self._sigs.get(signature)
+        if sig_id is None:
+            sig_id = self._next_sig_id
+            self._next_sig_id += 1
+            self._sigs[signature] = sig_id
+            self._sig_refs[sig_id] = (signature, 0)
+        self._sig_refs[sig_id] = (signature, self._sig_refs[sig_id][1] + 1)
+        return sig_id
+
+    def _release_signature(self, sig_id: int):
+        signature, refs = self._sig_refs[sig_id]
+        if refs > 1:
+            self._sig_refs[sig_id] = (signature, refs - 1)
+        else:
+            del self._sig_refs[sig_id]
+            del self._sigs[signature]
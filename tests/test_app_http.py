@@ -0,0 +1,47 @@
+from starlette.requests import Request
+
+from api.app import HTML_ETAG, HTML_GZIP_ETAG, HTML_MTIME, _accepts_gzip, _html_not_modified
+from email.utils import formatdate
+
+
+def request_with(**headers):
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def test_accepts_gzip_honours_q_values():
+    assert _accepts_gzip("gzip")
+    assert _accepts_gzip("br, gzip;q=0.5")
+    assert _accepts_gzip("GZIP ; Q=0.1")
+    assert _accepts_gzip("*")
+    assert not _accepts_gzip("")
+    assert not _accepts_gzip("identity")
+    assert not _accepts_gzip("gzip;q=0")
+    assert not _accepts_gzip("gzip;q=0.000")
+    assert not _accepts_gzip("*;q=0")
+    assert not _accepts_gzip("gzip;q=0, *")  # an explicit gzip entry beats the wildcard
+    assert not _accepts_gzip("x-gzip")
+
+
+def test_gzip_variant_has_its_own_etag():
+    assert HTML_ETAG != HTML_GZIP_ETAG
+
+
+def test_if_none_match():
+    assert _html_not_modified(request_with(if_none_match=HTML_ETAG))
+    assert _html_not_modified(request_with(if_none_match=HTML_GZIP_ETAG))
+    assert _html_not_modified(request_with(if_none_match=f'"other", W/{HTML_GZIP_ETAG}'))
+    assert _html_not_modified(request_with(if_none_match="*"))
+    assert not _html_not_modified(request_with(if_none_match='"stale"'))
+
+
+def test_if_none_match_wins_over_if_modified_since():
+    fresh = formatdate(HTML_MTIME + 60, usegmt=True)
+    assert not _html_not_modified(request_with(if_none_match='"stale"', if_modified_since=fresh))
+
+
+def test_if_modified_since():
+    assert _html_not_modified(request_with(if_modified_since=formatdate(HTML_MTIME, usegmt=True)))
+    assert not _html_not_modified(request_with(if_modified_since=formatdate(HTML_MTIME - 60, usegmt=True)))
+    assert not _html_not_modified(request_with(if_modified_since="not a date"))
+    assert not _html_not_modified(request_with())
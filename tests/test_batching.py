@@ -0,0 +1,96 @@
+import asyncio
+import threading
+
+from api.batching import RecommendBatcher
+
+
+class FakeRecommender:
+    """recommend_batch stand-in: answers each query with its text, failing any query named "bad"."""
+
+    def __init__(self, release=None):
+        self.calls = []
+        self.release = release
+
+    def recommend_batch(self, user_queries, k=5, signatures=None, on_result=None):
+        self.calls.append((list(user_queries), k, list(signatures or [])))
+        if self.release is not None:
+            self.release.wait(5)
+        results = []
+        for i, query in enumerate(user_queries):
+            result = ValueError(query) if query == "bad" else [{"title": query}]
+            if on_result is not None:
+                on_result(i, result)
+            results.append(result)
+        return results
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_identical_submissions_share_one_call():
+    recommender = FakeRecommender()
+
+    async def scenario():
+        batcher = RecommendBatcher(recommender)
+        batcher.start()
+        try:
+            return await asyncio.gather(batcher.submit("q", 5), batcher.submit("q", 5), batcher.submit("q", 5, "mood=sad"))
+        finally:
+            await batcher.stop()
+
+    first, second, filtered = run(scenario())
+    assert first == second == filtered == [{"title": "q"}]
+    assert recommender.calls == [(["q", "q"], 5, ["", "mood=sad"])]
+
+
+def test_failed_query_only_fails_its_own_callers():
+    recommender = FakeRecommender()
+
+    async def scenario():
+        batcher = RecommendBatcher(recommender)
+        batcher.start()
+        try:
+            return await asyncio.gather(batcher.submit("good", 5), batcher.submit("bad", 5), return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    good, bad = run(scenario())
+    assert good == [{"title": "good"}]
+    assert isinstance(bad, ValueError)
+
+
+def test_groups_by_k():
+    recommender = FakeRecommender()
+
+    async def scenario():
+        batcher = RecommendBatcher(recommender)
+        batcher.start()
+        try:
+            return await asyncio.gather(batcher.submit("a", 5), batcher.submit("b", 10))
+        finally:
+            await batcher.stop()
+
+    assert run(scenario()) == [[{"title": "a"}], [{"title": "b"}]]
+    assert sorted(k for _, k, _ in recommender.calls) == [5, 10]
+
+
+def test_stop_fails_pending_callers_instead_of_hanging():
+    release = threading.Event()
+    recommender = FakeRecommender(release)
+
+    async def scenario():
+        batcher = RecommendBatcher(recommender, max_wait_ms=1)
+        batcher.start()
+        running = asyncio.create_task(batcher.submit("running", 5))
+        await asyncio.sleep(0.05)  # "running" is now inside recommend_batch
+        pending = asyncio.create_task(batcher.submit("pending", 5))
+        await asyncio.sleep(0)
+        batcher._task.cancel()  # the collector never picks "pending" up
+        asyncio.get_running_loop().call_later(0.05, release.set)
+        await batcher.stop()
+        return await asyncio.gather(running, pending, return_exceptions=True)
+
+    running, pending = run(scenario())
+    assert running == [{"title": "running"}]
+    assert isinstance(pending, RuntimeError)
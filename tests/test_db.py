@@ -0,0 +1,64 @@
+import sqlite3
+
+import pytest
+
+import db
+
+
+@pytest.fixture
+def database(tmp_path):
+    db.init_db(tmp_path / "queries.db")
+    yield tmp_path / "queries.db"
+    db.close_db()
+
+
+def count(table):
+    return db._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_round_trip(database):
+    db.save_transcription("audio", "hello")
+    db.save_llm_response("prompt", "[]")
+    assert db.get_transcription("audio") == "hello"
+    assert db.get_llm_response("prompt") == "[]"
+    assert db.get_transcription("missing") is None
+
+
+def test_expired_rows_are_not_returned(database, monkeypatch):
+    db.save_transcription("audio", "hello")
+    db.save_llm_response("prompt", "[]")
+    monkeypatch.setattr(db, "TRANSCRIPTION_TTL_S", -1)
+    monkeypatch.setattr(db, "LLM_RESPONSE_TTL_S", -1)
+    assert db.get_transcription("audio") is None
+    assert db.get_llm_response("prompt") is None
+
+
+def test_saves_prune_to_the_newest_rows(database, monkeypatch):
+    monkeypatch.setattr(db, "LLM_RESPONSE_MAX_ROWS", 3)
+    monkeypatch.setattr(db, "_PRUNE_EVERY", 5)
+    monkeypatch.setitem(db._saves, "llm_responses", 0)
+    for i in range(5):
+        db.save_llm_response(f"p{i}", str(i))
+    assert count("llm_responses") == 3
+    assert db.get_llm_response("p4") == "4"
+    assert db.get_llm_response("p0") is None
+
+
+def test_init_migrates_and_prunes_tables_without_created(tmp_path):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE transcriptions (hash TEXT PRIMARY KEY, text TEXT NOT NULL)")
+    conn.execute("CREATE TABLE llm_responses (hash TEXT PRIMARY KEY, content TEXT NOT NULL)")
+    conn.execute("INSERT INTO transcriptions VALUES ('audio', 'hello')")
+    conn.execute("INSERT INTO llm_responses VALUES ('prompt', '[]')")
+    conn.commit()
+    conn.close()
+
+    db.init_db(path)
+    try:
+        assert count("transcriptions") == 0
+        assert count("llm_responses") == 0
+        db.save_transcription("audio", "again")
+        assert db.get_transcription("audio") == "again"
+    finally:
+        db.close_db()
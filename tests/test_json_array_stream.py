@@ -0,0 +1,45 @@
+from generator import _JSONArrayStream
+
+
+def feed_all(*chunks):
+    parser = _JSONArrayStream()
+    return [obj for chunk in chunks for obj in parser.feed(chunk)]
+
+
+def test_yields_objects_as_they_complete():
+    parser = _JSONArrayStream()
+    assert parser.feed('```json\n[{"title": "A", "reason": "x"},') == [{"title": "A", "reason": "x"}]
+    assert parser.feed(' {"title": "B"') == []
+    assert parser.feed('}]\n```') == [{"title": "B"}]
+
+
+def test_brackets_and_braces_inside_strings():
+    assert feed_all('[{"title": "A [b] {c}", "reason": "say \\"}\\""}]') == [
+        {"title": "A [b] {c}", "reason": 'say "}"'}
+    ]
+
+
+def test_nested_values_stay_in_their_object():
+    assert feed_all('[{"title": "A", "tags": [{"x": 1}]}]') == [{"title": "A", "tags": [{"x": 1}]}]
+
+
+def test_ignores_objects_after_the_array():
+    assert feed_all('[{"title":"A"}]\nNote: {"title":"bogus"}') == [{"title": "A"}]
+    assert feed_all('[{"title":"A"}', ']', ' {"title":"bogus"}') == [{"title": "A"}]
+
+
+def test_bracket_in_preamble_does_not_open_the_array():
+    assert feed_all('I can\'t find a "[" here.. [{"title":"A"}]') == [{"title": "A"}]
+    assert feed_all("Picks [see below]: [", "\n  ", '{"title":"A"}]') == [{"title": "A"}]
+
+
+def test_empty_array():
+    assert feed_all("[]", '{"title": "bogus"}') == []
+
+
+def test_done_only_after_the_array_closes():
+    parser = _JSONArrayStream()
+    parser.feed('[{"title": "A"}, {"title": "B"')
+    assert not parser.done
+    parser.feed("}]")
+    assert parser.done
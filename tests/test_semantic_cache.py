@@ -0,0 +1,66 @@
+import numpy as np
+
+from semantic_cache import SemanticCache, filter_signature
+
+
+def unit(i, dim=4):
+    vec = np.zeros(dim)
+    vec[i] = 1.0
+    return vec
+
+
+def test_filter_signature_is_canonical():
+    assert filter_signature(None) == ""
+    assert filter_signature({"mood": "", "age": "  "}) == ""
+    assert filter_signature({"mood": "Happy ", "genre": "Comedy"}) == filter_signature({"genre": "comedy", "mood": "happy"})
+    assert filter_signature({"mood": "happy"}) != filter_signature({"mood": "sad"})
+
+
+def test_semantic_hit_needs_same_k_and_signature():
+    cache = SemanticCache(threshold=0.97)
+    cache.put(unit(0), 5, ["happy"], signature="mood=happy")
+    near = unit(0) + 0.01 * unit(1)
+    assert cache.get(near, 5, "mood=happy") == ["happy"]
+    assert cache.get(near, 5, "mood=sad") is None
+    assert cache.get(near, 10, "mood=happy") is None
+    assert cache.get(unit(1), 5, "mood=happy") is None
+
+
+def test_exact_key_includes_k_and_signature():
+    cache = SemanticCache()
+    cache.put(unit(0), 5, ["a"], query="  date night ", signature="mood=happy")
+    assert cache.get_exact("date night", 5, "mood=happy") == ["a"]
+    assert cache.get_exact("date night", 5) is None
+    assert cache.get_exact("date night", 10, "mood=happy") is None
+
+
+def test_eviction_reuses_the_least_recently_used_slot():
+    cache = SemanticCache(max_size=2)
+    cache.put(unit(0), 5, ["a"], query="a")
+    cache.put(unit(1), 5, ["b"], query="b")
+    assert cache.get_exact("a", 5) == ["a"]  # "b" is now the oldest
+    cache.put(unit(2), 5, ["c"], query="c")
+
+    assert cache.get_exact("b", 5) is None
+    assert cache.get(unit(1), 5) is None
+    assert cache.get_exact("a", 5) == ["a"]
+    assert cache.get_exact("c", 5) == ["c"]
+    assert len(cache._exact) == len(cache._slot_keys) == 2
+    assert set(cache._exact.values()) == set(cache._slot_keys) == {0, 1}
+
+
+def test_evicting_a_slot_keeps_a_newer_exact_entry_for_the_same_query():
+    cache = SemanticCache(max_size=2)
+    cache.put(unit(0), 5, ["old"], query="q")
+    cache.put(unit(1), 5, ["new"], query="q")  # same key now points at slot 1
+    cache.put(unit(2), 5, ["c"], query="c")  # evicts slot 0
+    assert cache.get_exact("q", 5) == ["new"]
+
+
+def test_signature_ids_are_released_with_their_last_slot():
+    cache = SemanticCache(max_size=2)
+    for i in range(5):
+        cache.put(unit(i % 4), 5, [i], signature=f"s{i}")
+    assert set(cache._sigs) == {"s3", "s4"}
+    assert {sig for sig, _ in cache._sig_refs.values()} == {"s3", "s4"}
+    assert cache.get(unit(0), 5, "s4") == [4]
@@ -1,13 +1,24 @@
 # TMDB client helper to fetch poster URLs.
 
 import os
+from functools import lru_cache
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Optional
+from urllib3.util.retry import Retry
 
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 # Base URL for TMDB poster images – see https://developer.themoviedb.org/reference/configuration-details
 POSTER_BASE = "https://image.tmdb.org/t/p/w342"
 
+# Reuse TLS connections across lookups instead of a new handshake per title
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
 
 def fetch_poster_url(title: str) -> Optional[str]:
     """Return a poster image URL for a movie title via TMDB search API.
@@ -19,25 +30,31 @@ def fetch_poster_url(title: str) -> Optional[str]:
         return None
 
     try:
-        r = requests.get(
-            "https://api.themoviedb.org/3/search/movie",
-            params={
-                "api_key": TMDB_API_KEY,
-                "query": title,
-                "include_adult": "false",
-                "language": "en-US",
-            },
-            timeout=5,
-        )
-        if r.status_code != 200:
-            return None
-        data = r.json()
-        results = data.get("results")
-        if not results:
-            return None
-        poster_path = results[0].get("poster_path")
-        if poster_path:
-            return f"{POSTER_BASE}{poster_path}"
+        return _search_poster_url(title)
     except requests.RequestException:
-        pass
-    return None 
\ No newline at end of file
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _search_poster_url(title: str) -> Optional[str]:
+    # Popular titles come up again and again, so answers (including "no
+    # poster") are memoised; failed requests raise and are retried next time
+    r = _SESSION.get(
+        "https://api.themoviedb.org/3/search/movie",
+        params={
+            "api_key": TMDB_API_KEY,
+            "query": title,
+            "include_adult": "false",
+            "language": "en-US",
+        },
+        timeout=5,
+    )
+    r.raise_for_status()
+    data = r.json()
+    results = data.get("results")
+    if not results:
+        return None
+    poster_path = results[0].get("poster_path")
+    if poster_path:
+        return f"{POSTER_BASE}{poster_path}"
+    return None